@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线性能基准测试
+启动一个本地模拟服务器，模仿百度翻译(api/trans/vip/translate)、
+认证(oauth/2.0/token)和通用文字识别(ocr/v1/general_basic)接口的响应，
+可设置延迟、抖动、错误率、错误码和QPS上限；
+在此之上运行交互输入、长文档批量翻译和重复截图三个场景，
+输出吞吐量、延迟分位数和实际发出的API调用次数
+
+用法示例:
+    python bench_api.py
+    python bench_api.py --scenario typing --latency-ms 150 --jitter-ms 100 --qps 1
+    python bench_api.py --error-rate 0.05 --error-code 54003 --json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+# 场景中使用的示例句子
+SAMPLE_SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Please restart the application after changing the configuration file.",
+    "Screenshots are recognized by the OCR service and translated automatically.",
+    "Performance depends on network latency and the account's rate limit.",
+    "Long documents are split into chunks and translated in parallel.",
+    "Cached translations are returned instantly without calling the API.",
+    "The hotkey can be changed in the settings dialog.",
+    "Make sure the API keys are configured before translating.",
+]
+
+SCENARIOS = ("typing", "bulk", "screenshot")
+
+
+class MockBaiduServer:
+    """模拟百度翻译和OCR接口的本地HTTP服务器
+
+    每个请求按latency_ms加上±jitter_ms的随机抖动延迟后响应；
+    按error_rate的概率返回error_code；翻译接口每秒超过qps次时返回54003。
+    """
+
+    def __init__(self, latency_ms=80, jitter_ms=40, error_rate=0.0, error_code="52001", qps=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_code = str(error_code)
+        self.qps = qps
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self._server = None
+        # 统计信息
+        self.counts = {"translate": 0, "token": 0, "ocr": 0, "errors": 0, "throttled": 0}
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.dispatch()
+
+            def do_POST(self):
+                self.dispatch()
+
+            def dispatch(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf-8") if length else ""
+                params = {k: v for k, v in parse_qs(url.query).items()}
+                params.update(parse_qs(body, keep_blank_values=True))
+                status, response = server.handle(url.path, params)
+                data = json.dumps(response, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _throttled(self):
+        """翻译接口的QPS限制（最近1秒内的请求数）"""
+        if not self.qps:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.qps:
+                return True
+            self._recent.append(now)
+            return False
+
+    def _delay(self):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, delay) / 1000)
+
+    def handle(self, path, params):
+        """返回(HTTP状态码, 响应JSON)"""
+        if path.endswith("/oauth/2.0/token"):
+            self._count("token")
+            self._delay()
+            return 200, {"access_token": "mock-token", "expires_in": 2592000}
+
+        if path.endswith("/api/trans/vip/translate"):
+            self._count("translate")
+            if self._throttled():
+                self._count("throttled")
+                return 200, {"error_code": "54003", "error_msg": "Invalid Access Limit"}
+            self._delay()
+            if random.random() < self.error_rate:
+                self._count("errors")
+                return 200, {"error_code": self.error_code, "error_msg": "Mock error"}
+            query = params.get("q", [""])[0]
+            to_lang = params.get("to", ["zh"])[0]
+            lines = [line for line in query.split("\n") if line.strip()]
+            return 200, {"from": params.get("from", ["auto"])[0], "to": to_lang,
+                         "trans_result": [{"src": line, "dst": f"[{to_lang}] {line}"} for line in lines]}
+
+        if path.endswith("/ocr/v1/general_basic"):
+            self._count("ocr")
+            self._delay()
+            if random.random() < self.error_rate:
+                self._count("errors")
+                return 200, {"error_code": 282000, "error_msg": "internal error"}
+            size = len(params.get("image", [""])[0])
+            words = [f"mock line {i + 1}" for i in range(3)] + [f"image bytes {size}"]
+            return 200, {"log_id": random.randint(1, 10 ** 12), "words_result_num": len(words),
+                         "words_result": [{"words": word} for word in words]}
+
+        return 404, {"error_msg": "not found"}
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(name, latencies, elapsed, before, after, extra=None):
+    """汇总一个场景的结果"""
+    calls = {key: after[key] - before[key] for key in after}
+    result = {
+        "scenario": name,
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p90_ms": percentile(latencies, 0.9) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+        "api_calls": calls,
+    }
+    result.update(extra or {})
+    return result
+
+
+def run_typing(server, args):
+    """交互输入：每输入完一个单词停顿一次，翻译当前的全部文本；后几轮重复输入相同的句子"""
+    from cache import LRUCache
+    from translator_api import TranslatorAPI
+
+    cache = LRUCache(config.MEMORY_CACHE_MAX_KB * 1024)
+    latencies, cached, errors = [], 0, 0
+    before = server.snapshot()
+    start = time.perf_counter()
+    for _ in range(args.typing_rounds):
+        for sentence in SAMPLE_SENTENCES:
+            words = sentence.split(" ")
+            for count in range(1, len(words) + 1):
+                text = " ".join(words[:count])
+                request_start = time.perf_counter()
+                result = TranslatorAPI.translate_many([text], "auto", "zh", cache=cache,
+                                                      priority="interactive")[0]
+                latencies.append(time.perf_counter() - request_start)
+                cached += result.cached
+                errors += result.error is not None
+    elapsed = time.perf_counter() - start
+    return summarize("typing", latencies, elapsed, before, server.snapshot(),
+                     {"cache_hits": cached, "errors": errors})
+
+
+def run_bulk(server, args):
+    """长文档：分块并发翻译整篇文档，再修改一个段落后重新翻译"""
+    from cache import LRUCache
+    from document import DocumentTranslator
+    from translator_api import TranslatorAPI
+
+    rng = random.Random(0)
+    paragraphs = [" ".join(rng.choice(SAMPLE_SENTENCES) + f" ({i})" for _ in range(3))
+                  for i in range(args.bulk_paragraphs)]
+    document = "\n\n".join(paragraphs)
+    cache = LRUCache(config.MEMORY_CACHE_MAX_KB * 1024)
+    translator = DocumentTranslator(TranslatorAPI.translate_many, max_bytes=config.BAIDU_MAX_QUERY_BYTES,
+                                    workers=config.DOCUMENT_WORKERS, cache=cache, priority="bulk")
+
+    latencies = []
+    first_chunk = []
+    before = server.snapshot()
+    start = time.perf_counter()
+
+    def on_chunk(index, total, translated):
+        if index == 0:
+            first_chunk.append(time.perf_counter() - start)
+
+    _, error = translator.translate(document, "auto", "zh", on_chunk=on_chunk)
+    latencies.append(time.perf_counter() - start)
+    full_calls = server.snapshot()["translate"] - before["translate"]
+
+    # 修改中间的一个段落，只有这个段落需要重新翻译
+    paragraphs[len(paragraphs) // 2] += " Edited."
+    edit_start = time.perf_counter()
+    translator.translate("\n\n".join(paragraphs), "auto", "zh")
+    latencies.append(time.perf_counter() - edit_start)
+    elapsed = time.perf_counter() - start
+    translator.shutdown()
+
+    after = server.snapshot()
+    result = summarize("bulk", latencies, elapsed, before, after, {
+        "chars": len(document),
+        "chars_per_second": len(document) / latencies[0] if latencies[0] > 0 else 0.0,
+        "first_chunk_ms": first_chunk[0] * 1000 if first_chunk else None,
+        "full_document_calls": full_calls,
+        "edit_calls": after["translate"] - before["translate"] - full_calls,
+        "error": error,
+    })
+    # 文档场景的吞吐量按字符计算更有意义，请求数只有两次
+    result["throughput"] = result["chars_per_second"]
+    return result
+
+
+def run_screenshot(server, args):
+    """重复截图：反复识别test.jpg，其中夹杂轻微变化的截图和不同区域的截图"""
+    from PIL import Image
+    from ocr import OCREngine
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test.jpg")
+    base = Image.open(path).convert("RGB")
+    width, height = base.size
+    engine = OCREngine.from_config()
+
+    latencies, errors = [], 0
+    before = server.snapshot()
+    start = time.perf_counter()
+    for i in range(args.screenshots):
+        if i % 5 == 4:
+            # 截取不同的区域，应当重新识别
+            image = base.crop((0, 0, max(1, width * (i % 3 + 2) // 5), height))
+        else:
+            # 同一区域重新截图，像素有轻微变化
+            image = base.copy()
+            image.putpixel((i % width, i % height), (255, 255, 255))
+        request_start = time.perf_counter()
+        text, _ = engine.recognize(image)
+        latencies.append(time.perf_counter() - request_start)
+        errors += text.startswith(("OCR", "图像为空"))
+    elapsed = time.perf_counter() - start
+    return summarize("screenshot", latencies, elapsed, before, server.snapshot(),
+                     {"errors": errors, "ocr_cache": engine.result_cache.stats()})
+
+
+def configure(base_url, args, temp_dir):
+    """把翻译和OCR接口指向模拟服务器"""
+    import ocr
+    from providers import BaiduProvider
+
+    config.BAIDU_APP_ID = "mock-app-id"
+    config.BAIDU_SECRET_KEY = "mock-secret"
+    config.BAIDU_OCR_API_KEY = "mock-ocr-key"
+    config.BAIDU_OCR_SECRET_KEY = "mock-ocr-secret"
+    config.TRANSLATION_PROVIDERS = ["baidu"]
+    config.TRANSLATION_SERVICE_URL = ""
+    config.OCR_TOKEN_CACHE_PATH = os.path.join(temp_dir, "ocr_token.json")
+    config.BAIDU_QPS = args.client_qps or args.qps or 1000
+    config.HEDGE_ENABLED = args.hedge
+
+    BaiduProvider.URL = base_url + "/api/trans/vip/translate"
+    ocr.TOKEN_URL = base_url + "/oauth/2.0/token"
+    ocr.OCR_URL = base_url + "/rest/2.0/ocr/v1/general_basic"
+
+
+def print_report(results):
+    for result in results:
+        calls = result["api_calls"]
+        unit = "字符/s" if result["scenario"] == "bulk" else "次/s"
+        print(f"[{result['scenario']}] {result['requests']}次 用时{result['seconds']:.2f}s "
+              f"吞吐量{result['throughput']:.1f}{unit}")
+        print(f"    延迟 p50 {result['p50_ms']:.1f}ms  p90 {result['p90_ms']:.1f}ms  "
+              f"p99 {result['p99_ms']:.1f}ms  最大 {result['max_ms']:.1f}ms")
+        print(f"    API调用 翻译{calls['translate']}次 认证{calls['token']}次 OCR{calls['ocr']}次 "
+              f"（其中限流{calls['throttled']}次 错误{calls['errors']}次）")
+        if result["scenario"] == "typing":
+            print(f"    缓存命中{result['cache_hits']}次 失败{result['errors']}次")
+        elif result["scenario"] == "bulk":
+            print(f"    {result['chars']}字符 首块 {result['first_chunk_ms'] or 0:.1f}ms "
+                  f"整篇{result['full_document_calls']}次调用 修改一段后{result['edit_calls']}次调用")
+        elif result["scenario"] == "screenshot":
+            print(f"    失败{result['errors']}次 OCR缓存 {result['ocr_cache']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="使用本地模拟服务器的离线性能基准测试")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all", help="运行的场景")
+    parser.add_argument("--latency-ms", type=float, default=80, help="模拟接口的平均延迟")
+    parser.add_argument("--jitter-ms", type=float, default=40, help="延迟的随机抖动范围")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误的概率")
+    parser.add_argument("--error-code", default="52001", help="翻译接口返回的错误码")
+    parser.add_argument("--qps", type=int, default=10, help="模拟翻译接口的QPS上限，0为不限")
+    parser.add_argument("--client-qps", type=float, default=None, help="客户端限流速率，默认与--qps相同")
+    parser.add_argument("--hedge", action="store_true", help="开启对冲请求")
+    parser.add_argument("--typing-rounds", type=int, default=2, help="交互输入场景重复的轮数")
+    parser.add_argument("--bulk-paragraphs", type=int, default=200, help="长文档场景的段落数")
+    parser.add_argument("--screenshots", type=int, default=20, help="重复截图场景的截图次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    random.seed(args.seed)
+    server = MockBaiduServer(args.latency_ms, args.jitter_ms, args.error_rate,
+                             args.error_code, args.qps).start()
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    runners = {"typing": run_typing, "bulk": run_bulk, "screenshot": run_screenshot}
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            configure(server.base_url, args, temp_dir)
+            for name in scenarios:
+                results.append(runners[name](server, args))
+    finally:
+        server.stop()
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_report(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+截图数据复制检查
+按截图流程依次执行截屏、选择窗口显示、裁剪、剪贴板、感知哈希、OCR预处理和编码，
+统计每次截图发生的整块像素复制次数和各阶段耗时；复制次数超过预期时以非零状态退出
+
+预期的复制：截屏结果转为共享缓冲区1次，写入剪贴板1次（剪贴板需要独立的内存），其余阶段均为视图。
+没有安装PyQt5时跳过选择窗口和剪贴板两个阶段。
+
+安装了PyQt5时还会在offscreen平台上运行translator.py中真实的截图流程
+（ScreenshotThread -> ScreenshotWidget -> process_selected_area -> OCR），
+截屏换成模拟的屏幕，OCR接口换成本地返回的结果，不访问网络；每次截图的复制次数必须正好是2次。
+
+用法示例:
+    python bench_image.py
+    python bench_image.py --size 3840x2160 --runs 5
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+from image_buffer import ImageBuffer, copy_stats, reset_copy_stats
+
+
+def make_screen(width, height):
+    """用test.jpg平铺出一张全屏大小的图像，代替真实的截屏"""
+    from PIL import Image
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test.jpg")
+    tile = Image.open(path).convert("RGB")
+    screen = Image.new("RGB", (width, height))
+    for top in range(0, height, tile.height):
+        for left in range(0, width, tile.width):
+            screen.paste(tile, (left, top))
+    return screen
+
+
+def qt_available():
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+    except ImportError:
+        return False
+    if QApplication.instance() is None:
+        qt_available.app = QApplication(sys.argv)
+    return True
+
+
+def run_capture(screen, use_qt):
+    """执行一次截图流程，返回(各阶段耗时, 复制统计)"""
+    from ocr import ImagePreprocessor, OCRResultCache
+
+    timings = {}
+
+    def stage(name, func):
+        start = time.perf_counter()
+        result = func()
+        timings[name] = time.perf_counter() - start
+        return result
+
+    reset_copy_stats()
+    buffer = stage("capture", lambda: ImageBuffer.from_pil(screen))
+    if use_qt:
+        qimage = stage("overlay", buffer.qimage)
+        # 选择窗口显示的QImage必须直接引用缓冲区
+        assert int(qimage.constBits()) == buffer.array.ctypes.data, "选择窗口复制了截图数据"
+    width, height = buffer.size
+    region = stage("crop", lambda: buffer.crop(width // 8, height // 8, width * 5 // 8, height * 3 // 8))
+    if use_qt:
+        stage("clipboard", lambda: region.qimage_copy("clipboard"))
+    stage("hash", lambda: OCRResultCache().fingerprint(region))
+    stage("encode", lambda: ImagePreprocessor().process(region))
+    return timings, copy_stats()
+
+
+def prepare_app(screen):
+    """创建离线运行的主窗口：截屏返回模拟的屏幕，OCR不访问网络，不注册热键也不预热连接"""
+    from PIL import ImageGrab
+    import config
+    import translator
+    from ocr import OCREngine
+
+    ImageGrab.grab = lambda *args, **kwargs: screen
+    config.DISK_CACHE_ENABLED = False
+    config.TM_ENABLED = False
+    config.TRANSLATION_SERVICE_URL = ""
+    if OCREngine.credentials_error() is not None:
+        config.BAIDU_OCR_API_KEY = config.BAIDU_OCR_SECRET_KEY = "bench"
+
+    engine = OCREngine.from_config()
+    engine.token_manager.get_token = lambda: "bench"
+    engine._upload = lambda image_base64, access_token: {"words_result": [{"words": "bench"}]}
+    translator.TranslatorApp._ocr_engine = engine
+    translator.TranslatorApp.deferred_init = lambda self: None
+    return translator.TranslatorApp()
+
+
+def wait_until(condition, timeout=30):
+    """处理Qt事件直到condition()为真"""
+    from PyQt5.QtWidgets import QApplication
+
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("等待截图流程超时")
+        QApplication.processEvents()
+        time.sleep(0.005)
+
+
+def run_app_capture(app):
+    """通过主窗口执行一次真实的截图流程，返回复制统计"""
+    from PyQt5.QtCore import Qt, QPoint
+    from PyQt5.QtTest import QTest
+
+    reset_copy_stats()
+    app.take_screenshot()
+    wait_until(lambda: app.screenshot_widget is not None)
+    widget = app.screenshot_widget
+    width, height = widget.width(), widget.height()
+    QTest.mousePress(widget, Qt.LeftButton, pos=QPoint(width // 8, height // 8))
+    QTest.mouseRelease(widget, Qt.LeftButton, pos=QPoint(width * 5 // 8, height * 3 // 8))
+    # 选区交给OCR线程识别，识别结果显示后流程结束
+    wait_until(lambda: getattr(app, "ocr_thread", None) is None
+               and app.source_text.toPlainText() == "bench")
+    app.source_text.clear()
+    return copy_stats()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="截图流程的像素复制次数检查")
+    parser.add_argument("--size", default="2560x1440", help="模拟的屏幕分辨率，如2560x1440")
+    parser.add_argument("--runs", type=int, default=3, help="重复次数")
+    parser.add_argument("--no-qt", action="store_true", help="跳过需要PyQt5的阶段")
+    parser.add_argument("--no-app", action="store_true", help="跳过主窗口中真实截图流程的检查")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    use_qt = not args.no_qt and qt_available()
+    expected = 2 if use_qt else 1
+    screen = make_screen(width, height)
+
+    runs = [run_capture(screen, use_qt) for _ in range(max(1, args.runs))]
+    for name in runs[0][0]:
+        values = [timings[name] * 1000 for timings, _ in runs]
+        print(f"{name:<10} 中位数 {statistics.median(values):8.2f}ms")
+
+    failed = False
+    for index, (_, stats) in enumerate(runs):
+        reasons = ", ".join(f"{reason}×{count}" for reason, count in sorted(stats["reasons"].items()))
+        print(f"第{index + 1}次截图: 复制{stats['copies']}次 {stats['bytes'] / 1024 / 1024:.1f} MB ({reasons})")
+        if stats["copies"] > expected:
+            failed = True
+    if use_qt and not args.no_app:
+        app = prepare_app(screen)
+        for index in range(max(1, args.runs)):
+            stats = run_app_capture(app)
+            reasons = ", ".join(f"{reason}×{count}" for reason, count in sorted(stats["reasons"].items()))
+            print(f"主窗口第{index + 1}次截图: 复制{stats['copies']}次 ({reasons})")
+            if stats["copies"] != expected:
+                failed = True
+        app.close()
+    if not use_qt:
+        print("未使用PyQt5，已跳过选择窗口、剪贴板阶段和主窗口截图流程")
+    if failed:
+        print(f"失败: 每次截图的复制次数不是预期的{expected}次", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+翻译记忆查找速度测试
+以Python标准库源码中的英文注释和按字频生成的中文句子（各占一半）作为原文存入翻译记忆，
+分别测量改动一个字符后的相近句子和无关句子的查找耗时，输出建立索引的耗时、查找耗时分位数和命中率；查找耗时的p99超过阈值时以非零状态退出
+
+用法示例:
+    python bench_memory.py
+    python bench_memory.py --segments 200000 --queries 5000 --max-p99-ms 1
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+from translation_memory import TranslationMemory
+
+# 常用汉字，按使用频率从高到低排列
+CHINESE_CHARS = ("的一是不了人我在有他这中大来上国个到说们为子和你地出道也时年得就那要下以生会自之着去"
+                 "过家学对可她里后小么心多天而能好都然没日于起还发成事只作当想看文无开手十用主行方又如前所本见"
+                 "经头面公同三已老从动两长知民样现分将外但身些与高意进把法此实回二理美点月明其种声全工己话")
+CHINESE_WEIGHTS = [1 / rank for rank in range(1, len(CHINESE_CHARS) + 1)]
+
+
+def english_sentences():
+    """从Python标准库源码的注释中取英文句子，作为真实的英文文本"""
+    root = os.path.dirname(os.__file__)
+    sentences = set()
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(".py"):
+                continue
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8", errors="ignore") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line.startswith("# ") and 20 <= len(line) <= 200 and " " in line[2:]:
+                            sentences.add(line[2:].strip())
+            except OSError:
+                pass
+    return sorted(sentences)
+
+
+def chinese_sentence(rng):
+    return "".join(rng.choices(CHINESE_CHARS, CHINESE_WEIGHTS, k=rng.randint(8, 40)))
+
+
+def mutate(rng, text):
+    """改动一个字符，模拟OCR误差或小的编辑"""
+    index = rng.randrange(len(text))
+    replacement = rng.choice(CHINESE_CHARS if not text.isascii() else "abcdefghijklmnopqrstuvwxyz")
+    return text[:index] + replacement + text[index + 1:]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="翻译记忆查找速度测试")
+    parser.add_argument("--segments", type=int, default=100000, help="存入的条目数")
+    parser.add_argument("--queries", type=int, default=2000, help="相近句子和无关句子各查找多少次")
+    parser.add_argument("--threshold", type=float, default=0.8, help="相似度阈值")
+    parser.add_argument("--seed", type=int, default=1, help="随机数种子")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="查找耗时p99的上限")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    memory = TranslationMemory(threshold=args.threshold, max_segments=args.segments)
+
+    english = english_sentences()
+    rng.shuffle(english)
+    # 留出一部分英文句子作为无关句子查找
+    english, unrelated = english[:args.segments // 2], english[args.segments // 2:]
+    sources = english + [chinese_sentence(rng) for _ in range(args.segments - len(english))]
+    # 与启动时从文件载入的方式相同
+    start = time.perf_counter()
+    memory.extend(("auto", "zh", source, f"译文{index}") for index, source in enumerate(sources))
+    build_seconds = time.perf_counter() - start
+    print(f"建立索引: {len(memory)} 条（英文 {len(english)} 条），耗时 {build_seconds:.1f}s")
+
+    # 第一次查找时才导入NumPy，不计入耗时
+    memory.lookup(sources[0], "auto", "zh")
+
+    failed = False
+    for name, make_query in (("相近句子", lambda: mutate(rng, rng.choice(sources))),
+                             ("无关句子", lambda: rng.choice(unrelated) if unrelated and rng.random() < 0.5
+                              else chinese_sentence(rng))):
+        queries = [make_query() for _ in range(args.queries)]
+        timings, hits = [], 0
+        for query in queries:
+            start = time.perf_counter()
+            match = memory.lookup(query, "auto", "zh")
+            timings.append((time.perf_counter() - start) * 1000)
+            hits += match is not None
+        p99 = percentile(timings, 0.99)
+        print(f"{name}: p50 {percentile(timings, 0.5):.3f}ms  p90 {percentile(timings, 0.9):.3f}ms  "
+              f"p99 {p99:.3f}ms  最大 {max(timings):.3f}ms  命中 {hits / len(queries):.0%}")
+        if args.max_p99_ms is not None and p99 > args.max_p99_ms:
+            failed = True
+
+    if failed:
+        print(f"失败: 查找耗时p99超过{args.max_p99_ms}ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
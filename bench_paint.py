@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+截图选择窗口绘制基准测试
+在不同屏幕分辨率下模拟拖动选择区域，测量每一帧的绘制耗时，
+并与每帧重绘整个窗口的方式对比；拖动时的耗时应与屏幕分辨率基本无关
+
+用法示例:
+    python bench_paint.py
+    python bench_paint.py --sizes 1920x1080,3840x2160 --frames 200 --max-frame-ms 8
+超过阈值时以非零状态退出
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt, QEvent, QPoint, QPointF, QRect
+from PyQt5.QtGui import QImage, QMouseEvent, QRegion
+from PyQt5.QtWidgets import QApplication
+
+
+def make_buffer(width, height):
+    """生成一张带渐变的全屏图像，代替真实的截屏"""
+    import numpy as np
+    from image_buffer import ImageBuffer
+
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    y = np.linspace(0, 255, height, dtype=np.uint8)
+    array = np.empty((height, width, 3), dtype=np.uint8)
+    array[..., 0] = x[None, :]
+    array[..., 1] = y[:, None]
+    array[..., 2] = 128
+    return ImageBuffer(array)
+
+
+def mouse_event(kind, x, y):
+    return QMouseEvent(kind, QPointF(x, y), Qt.LeftButton, Qt.LeftButton, Qt.NoModifier)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def measure(width, height, frames, step):
+    """模拟一次拖动，返回(按需重绘每帧耗时, 整窗重绘每帧耗时)，单位毫秒"""
+    import translator
+
+    widget = translator.ScreenshotWidget(make_buffer(width, height))
+    widget.setWindowState(Qt.WindowNoState)
+    widget.resize(width, height)
+    target = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    full = QRect(0, 0, width, height)
+
+    # 记录窗口请求重绘的区域，由测试自己同步绘制并计时
+    requested = []
+    widget.update = lambda *args: requested.append(args[0] if args else full)
+
+    def paint(rect):
+        start = time.perf_counter()
+        widget.render(target, QPoint(rect.x(), rect.y()), QRegion(rect))
+        return (time.perf_counter() - start) * 1000
+
+    x, y = width // 4, height // 4
+    widget.mousePressEvent(mouse_event(QEvent.MouseButtonPress, x, y))
+    paint(requested.pop())
+
+    dirty_times, full_times = [], []
+    for index in range(frames):
+        x = min(width - 1, x + step)
+        y = min(height - 1, y + step * (1 if index % 2 else 0))
+        widget.mouseMoveEvent(mouse_event(QEvent.MouseMove, x, y))
+        rect = requested.pop()
+        dirty_times.append(paint(rect))
+        full_times.append(paint(full))
+
+    widget.release_frame()
+    widget.close()
+    return dirty_times, full_times
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="截图选择窗口的绘制耗时测试")
+    parser.add_argument("--sizes", default="1920x1080,3840x2160,7680x2160", help="屏幕分辨率列表，逗号分隔")
+    parser.add_argument("--frames", type=int, default=100, help="每个分辨率模拟的拖动帧数")
+    parser.add_argument("--step", type=int, default=6, help="每帧鼠标移动的像素数")
+    parser.add_argument("--max-frame-ms", type=float, default=None, help="按需重绘每帧耗时p90的上限")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    app = QApplication.instance() or QApplication(sys.argv)  # noqa: F841
+
+    failed = False
+    print(f"{'分辨率':<12}{'按需重绘 p50':>14}{'p90':>10}{'整窗重绘 p50':>14}{'p90':>10}")
+    for size in args.sizes.split(","):
+        width, height = (int(value) for value in size.lower().split("x"))
+        dirty_times, full_times = measure(width, height, args.frames, args.step)
+        dirty_p90 = percentile(dirty_times, 0.9)
+        print(f"{size:<12}{statistics.median(dirty_times):12.2f}ms{dirty_p90:8.2f}ms"
+              f"{statistics.median(full_times):12.2f}ms{percentile(full_times, 0.9):8.2f}ms")
+        if args.max_frame_ms is not None and dirty_p90 > args.max_frame_ms:
+            failed = True
+
+    if failed:
+        print(f"失败: 按需重绘每帧耗时p90超过{args.max_frame_ms}ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+启动速度基准测试
+在独立的子进程中多次测量translator.py的导入耗时和主窗口首次绘制耗时，
+并检查启动阶段是否加载了只在截图时才需要的模块
+
+用法示例:
+    python bench_startup.py --runs 5
+    python bench_startup.py --max-import-ms 300 --max-paint-ms 1500 --forbid-heavy
+超过阈值时以非零状态退出，可用于发现启动速度的退化
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# 只在截图、OCR或联网时才需要的模块，启动阶段不应加载
+HEAVY_MODULES = ("numpy", "PIL", "keyboard", "requests")
+
+
+def loaded_heavy_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def child_import():
+    """子进程：只测量导入translator模块的耗时"""
+    start = time.perf_counter()
+    import translator  # noqa: F401
+    import_seconds = time.perf_counter() - start
+    return {"import": import_seconds, "heavy": loaded_heavy_modules()}
+
+
+def child_paint():
+    """子进程：测量从导入到主窗口第一次绘制完成的耗时"""
+    start = time.perf_counter()
+    import translator
+    import_seconds = time.perf_counter() - start
+
+    from PyQt5.QtCore import QObject, QEvent, QTimer
+    from PyQt5.QtWidgets import QApplication
+
+    result = {"import": import_seconds}
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and "first_paint" not in result:
+                # 绘制事件处理完之后再记录时间
+                QTimer.singleShot(0, self.finish)
+            return False
+
+        def finish(self):
+            if "first_paint" not in result:
+                result["first_paint"] = time.perf_counter() - start
+                app.quit()
+
+    app = QApplication(sys.argv)
+    watcher = PaintWatcher()
+    window = translator.TranslatorApp()
+    result["construct"] = time.perf_counter() - start
+    # 显示之后的后台初始化会加载网络模块，只检查窗口创建完成时的状态
+    result["heavy"] = loaded_heavy_modules()
+    window.installEventFilter(watcher)
+    window.show()
+    # 防止没有收到绘制事件时一直等待
+    QTimer.singleShot(10000, app.quit)
+    app.exec_()
+    return result
+
+
+def run_child(mode, offscreen):
+    env = dict(os.environ)
+    if offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode],
+                          cwd=os.path.dirname(os.path.abspath(__file__)),
+                          env=env, capture_output=True, text=True)
+    # 结果在标准输出的最后一行，前面可能有程序自己的打印
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"子进程运行失败({mode}):\n{proc.stderr.strip()}")
+    return json.loads(lines[-1])
+
+
+def summarize(name, values):
+    values_ms = [v * 1000 for v in values]
+    median = statistics.median(values_ms)
+    print(f"{name:<12} 中位数 {median:8.1f}ms  最小 {min(values_ms):8.1f}ms  最大 {max(values_ms):8.1f}ms")
+    return median
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="translator.py启动速度基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="每项测量的重复次数")
+    parser.add_argument("--no-paint", action="store_true", help="只测量导入，不创建窗口")
+    parser.add_argument("--offscreen", action="store_true", help="使用Qt的offscreen平台（无显示器环境）")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="导入耗时中位数上限")
+    parser.add_argument("--max-paint-ms", type=float, default=None, help="首次绘制耗时中位数上限")
+    parser.add_argument("--forbid-heavy", action="store_true",
+                        help="启动阶段加载了NumPy、PIL、keyboard或requests时视为失败")
+    parser.add_argument("--child", choices=("import", "paint"), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    if args.child:
+        result = child_import() if args.child == "import" else child_paint()
+        print(json.dumps(result))
+        return 0
+
+    failures = []
+    heavy = set()
+
+    imports = [run_child("import", args.offscreen) for _ in range(max(1, args.runs))]
+    for result in imports:
+        heavy.update(result["heavy"])
+    import_ms = summarize("导入", [r["import"] for r in imports])
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"导入耗时 {import_ms:.1f}ms 超过上限 {args.max_import_ms:.1f}ms")
+
+    if not args.no_paint:
+        paints = [run_child("paint", args.offscreen) for _ in range(max(1, args.runs))]
+        paints = [r for r in paints if "first_paint" in r]
+        if not paints:
+            failures.append("没有收到主窗口的绘制事件")
+        else:
+            for result in paints:
+                heavy.update(result["heavy"])
+            summarize("创建窗口", [r["construct"] for r in paints])
+            paint_ms = summarize("首次绘制", [r["first_paint"] for r in paints])
+            if args.max_paint_ms is not None and paint_ms > args.max_paint_ms:
+                failures.append(f"首次绘制耗时 {paint_ms:.1f}ms 超过上限 {args.max_paint_ms:.1f}ms")
+
+    print(f"启动阶段加载的重量级模块: {', '.join(sorted(heavy)) or '无'}")
+    if args.forbid_heavy and heavy:
+        failures.append(f"启动阶段加载了 {', '.join(sorted(heavy))}")
+
+    for failure in failures:
+        print(f"失败: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
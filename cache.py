@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+翻译缓存
+内存中的LRU热缓存，基于SQLite的磁盘缓存（跨会话、跨进程共享翻译结果），以及两者组合的两级缓存
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# 连续的空格和制表符（不包含换行）
+_SPACES_RE = re.compile(r"[ \t　]+")
+
+
+def normalize_text(text):
+    """规范化文本，使仅有空白差异的文本命中同一缓存"""
+    text = unicodedata.normalize("NFC", text)
+    lines = [_SPACES_RE.sub(" ", line).strip() for line in text.strip().splitlines()]
+    return "\n".join(lines)
+
+
+def make_cache_key(text, from_lang, to_lang):
+    """生成缓存键：规范化文本 + 源语言 + 目标语言"""
+    return f"{normalize_text(text)}|{from_lang}|{to_lang}"
+
+
+class LRUCache:
+    """按字节数限制容量的LRU缓存
+
+    容量按键和值实际占用的内存计算，超出max_bytes时淘汰最久未使用的条目。
+    线程安全，并统计命中、未命中和淘汰次数。
+    """
+
+    # 每个条目在字典和链表中的额外开销（估算值）
+    ENTRY_OVERHEAD = 100
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def entry_size(cls, key, value):
+        """计算一个条目占用的字节数"""
+        return sys.getsizeof(key) + sys.getsizeof(value) + cls.ENTRY_OVERHEAD
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        size = self.entry_size(key, value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            # 单个条目超过总容量时不缓存
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class DiskCache:
+    """SQLite磁盘缓存
+
+    每个线程使用独立连接，WAL模式下多个程序实例可以同时读写；
+    条目超过ttl后失效，总大小超过max_bytes时按最近访问时间淘汰。
+    任何数据库错误都只当作未命中处理，不影响翻译本身。
+    """
+
+    # 访问时间的更新间隔，避免每次读取都写数据库
+    TOUCH_INTERVAL = 3600
+    # 每写入多少次检查一次容量
+    EVICT_EVERY = 50
+
+    def __init__(self, path, ttl=30 * 86400, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON translations(accessed)")
+        self.evict()
+
+    def _connect(self):
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _hash(key):
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """读取缓存，未命中或已过期返回None"""
+        now = time.time()
+        digest = self._hash(key)
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created, accessed FROM translations WHERE key = ?",
+                (digest,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created, accessed = row
+            if now - created > self.ttl:
+                conn.execute("DELETE FROM translations WHERE key = ?", (digest,))
+                self.misses += 1
+                return None
+            if now - accessed > self.TOUCH_INTERVAL:
+                conn.execute("UPDATE translations SET accessed = ? WHERE key = ?", (now, digest))
+            self.hits += 1
+            return value
+        except sqlite3.Error:
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """写入缓存"""
+        now = time.time()
+        size = len(key.encode("utf-8")) + len(value.encode("utf-8"))
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO translations (key, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self._hash(key), value, size, now, now))
+        except sqlite3.Error:
+            return
+
+        with self._lock:
+            self._writes += 1
+            need_evict = self._writes % self.EVICT_EVERY == 0
+        if need_evict:
+            self.evict()
+
+    def evict(self):
+        """删除过期条目，并把总大小控制在max_bytes以内"""
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM translations WHERE created < ?", (time.time() - self.ttl,))
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0]
+                if total > self.max_bytes:
+                    # 淘汰到容量的90%，避免频繁触发
+                    excess = total - int(self.max_bytes * 0.9)
+                    freed = 0
+                    victims = []
+                    for digest, size in conn.execute(
+                            "SELECT key, size FROM translations ORDER BY accessed"):
+                        victims.append((digest,))
+                        freed += size
+                        if freed >= excess:
+                            break
+                    conn.executemany("DELETE FROM translations WHERE key = ?", victims)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        """返回缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        """清空缓存"""
+        try:
+            self._connect().execute("DELETE FROM translations")
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class TieredCache:
+    """两级缓存：内存LRU在前，磁盘缓存在后
+
+    读取时先查内存，磁盘命中的条目提升到内存；写入时两级同时写入。
+    """
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return default if value is None else value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def stats(self):
+        stats = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
@@ -2,6 +2,8 @@
 配置文件，存储翻译API的密钥和其他设置
 """
 
+import os
+
 # 百度翻译API配置
 # 请替换为您自己的APP ID和密钥
 BAIDU_APP_ID = ""
@@ -13,12 +15,150 @@ BAIDU_SECRET_KEY = ""
 BAIDU_OCR_API_KEY = ""
 BAIDU_OCR_SECRET_KEY = ""
 
+# OCR access_token本地缓存文件，重启后无需重新认证
+OCR_TOKEN_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".translator", "ocr_token.json")
+
+# OCR上传图像的目标大小（KB），超过时改用JPEG编码
+OCR_TARGET_KB = 512
+# 上传图像最长边的像素数，超过时缩小
+OCR_MAX_SIDE = 2560
+# 最多缩小到原图的比例，避免小字无法识别
+OCR_MIN_SCALE = 0.5
+
+# OCR结果缓存条数，以及判定为相同截图的感知哈希最大汉明距离（共256位）
+OCR_CACHE_SIZE = 64
+OCR_HASH_THRESHOLD = 6
+
+# 截图高度超过该值（像素）时分块识别，设为0关闭分块
+OCR_TILE_MIN_HEIGHT = 1600
+# 每块的最大高度（像素），优先在空白行处切分
+OCR_TILE_HEIGHT = 1000
+# 找不到空白行时相邻块重叠的高度（像素），应大于一行文字的高度
+OCR_TILE_OVERLAP = 48
+# 同时识别的块数，不宜超过OCR接口的QPS上限
+OCR_TILE_WORKERS = 2
+
 # 有道翻译API配置（备选）
 YOUDAO_APP_KEY = "YOUR_APP_KEY"
 YOUDAO_APP_SECRET = "YOUR_APP_SECRET"
+# 有道翻译账号的QPS上限
+YOUDAO_QPS = 1
+# 有道翻译单次请求的文本字节上限
+YOUDAO_MAX_QUERY_BYTES = 5000
+
+# 翻译服务商，按优先顺序排列；未配置密钥的服务商自动跳过
+TRANSLATION_PROVIDERS = ["baidu", "youdao"]
+# 服务商连续失败多少次后暂停使用，以及暂停时长（秒）
+PROVIDER_FAILURE_THRESHOLD = 3
+PROVIDER_FAILURE_COOLDOWN = 30
+# 额度用尽或账号不可用时暂停使用的时长（秒）
+PROVIDER_QUOTA_COOLDOWN = 600
+# 按此比例把请求交给次优的服务商，使其延迟数据保持更新
+PROVIDER_PROBE_RATE = 0.05
+
+# 对冲请求：交互翻译超过一段时间仍未返回时，向备用服务商（或同一服务商）再发一个相同的请求，先返回的结果生效
+HEDGE_ENABLED = False
+# 等待时间取首选服务商最近请求延迟的分位数，并限制在上下限之间（毫秒）
+HEDGE_QUANTILE = 0.9
+HEDGE_MIN_DELAY_MS = 100
+HEDGE_MAX_DELAY_MS = 2000
+# 对冲请求最多占交互请求数的比例，限制额外消耗的API额度
+HEDGE_MAX_RATIO = 0.1
+
+# 性能设置
+# 后台翻译线程数
+TRANSLATE_WORKER_THREADS = 2
+# 自动翻译防抖：停止输入多少毫秒后翻译
+AUTO_TRANSLATE_DELAY_MS = 300
+# 长文本（200字以上）的防抖时间
+AUTO_TRANSLATE_LONG_TEXT_DELAY_MS = 800
+# 持续输入时最长等待多少毫秒必须翻译一次
+AUTO_TRANSLATE_MAX_WAIT_MS = 2000
+
+# 内存翻译缓存容量（KB），按实际占用内存计算
+MEMORY_CACHE_MAX_KB = 4096
+
+# 百度翻译单次请求的文本字节上限，批量翻译按此打包
+BAIDU_MAX_QUERY_BYTES = 6000
+# 百度翻译账号的QPS上限（标准版1，高级版10，尊享版100）
+BAIDU_QPS = 1
+# 限流：令牌桶最多积累的请求数
+RATE_LIMIT_BURST = 1
+# 交互请求和批量请求同时等待时分配额度的权重
+RATE_LIMIT_WEIGHTS = {"interactive": 3, "bulk": 1}
+# 频率受限(54003/54005)时重新排队的最大次数
+RATE_LIMIT_MAX_RETRIES = 4
+# 长文档分块翻译的并发数
+DOCUMENT_WORKERS = 4
+
+# 网络设置
+# 连接池大小（翻译和OCR共用）
+HTTP_POOL_SIZE = 10
+# 各接口的(连接超时, 读取超时)，单位秒
+HTTP_TIMEOUTS = {
+    "translate": (3, 5),
+    "token": (3, 5),
+    "ocr": (3, 15),
+    "service": (1, 30),
+}
+# 失败重试次数和退避基准时间（秒）
+HTTP_MAX_RETRIES = 2
+HTTP_RETRY_BACKOFF = 0.2
+
+# 截图设置
+# 窗口最小化后等待窗口管理器完成重绘的时间（毫秒）
+CAPTURE_SETTLE_MS = 100
+# 未收到最小化事件时最多等待多久开始截图（毫秒）
+CAPTURE_MINIMIZE_TIMEOUT_MS = 600
+
+# 实时翻译（监视屏幕区域）
+# 截图间隔（毫秒）
+WATCH_INTERVAL_MS = 500
+# 与上次识别的画面相比，亮度差超过WATCH_PIXEL_DELTA的像素占比超过该值才算内容变化
+WATCH_CHANGE_RATIO = 0.005
+WATCH_PIXEL_DELTA = 16
+# 内容变化后等待画面连续不变的帧数（如字幕淡入），以及最多等待的帧数
+WATCH_STABLE_FRAMES = 1
+WATCH_MAX_UNSTABLE_FRAMES = 4
+
+# 翻译服务模式（translate_service.py）
+# 设置后图形界面和命令行通过该服务翻译和识别，共用服务端的缓存和API额度，例如 "http://127.0.0.1:8765"
+TRANSLATION_SERVICE_URL = ""
+# 服务监听的地址和端口
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+# 服务访问令牌，非空时请求需带上X-Service-Token头
+SERVICE_TOKEN = ""
 
+# 磁盘翻译缓存，多个程序实例共享
+DISK_CACHE_ENABLED = True
+DISK_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".translator", "translation_cache.db")
+# 缓存有效期（天）
+DISK_CACHE_TTL_DAYS = 30
+# 缓存文件大小上限（MB）
+DISK_CACHE_MAX_MB = 50
 
+# 翻译记忆：查找与翻译过的原文相近（字符n-gram相似度）的条目，在获取准确译文期间先显示
+TM_ENABLED = True
+TM_PATH = os.path.join(os.path.expanduser("~"), ".translator", "translation_memory.db")
+# 保存的条目数上限，超过时淘汰最久没有更新的条目
+TM_MAX_SEGMENTS = 200000
+# 相似度达到该值时在状态栏给出建议；阈值越低，查找越慢（0.8时十万条以上仍在1毫秒以内）
+TM_SUGGEST_SCORE = 0.8
+# 相似度达到该值时直接在结果区域显示相近条目的译文，准确译文返回后替换
+TM_AUTO_APPLY_SCORE = 0.9
+# 参与匹配的原文长度范围（字符），过短的文本相似度没有意义
+TM_MIN_CHARS = 6
+TM_MAX_CHARS = 1000
 
+# 性能监控：记录截图和翻译各阶段的耗时
+METRICS_ENABLED = True
+# 统计文件（Prometheus文本格式），供监控系统抓取；为空时不导出
+METRICS_PATH = os.path.join(os.path.expanduser("~"), ".translator", "metrics.prom")
+# 计算分位数时每个阶段保留的最近样本数
+METRICS_WINDOW = 500
+# 导出统计文件的最短间隔（秒）
+METRICS_EXPORT_INTERVAL = 15
 
 # 界面设置
 DEFAULT_WIDTH = 800
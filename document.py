@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+长文档翻译
+按段落和句子边界把文本切分为大小受限的块，并发翻译后按原顺序拼接；
+段落逐个缓存，编辑后只翻译改动过的段落
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import bind
+
+# 句子结束位置：中英文句末标点及其后的空白
+_SENTENCE_END_RE = re.compile(r"(?<=[。！？；.!?;])[ \t]*")
+# 段落：正文及其后的换行
+_PARAGRAPH_RE = re.compile(r"[^\n]*\n*")
+
+
+def _byte_len(text):
+    return len(text.encode("utf-8"))
+
+
+def _hard_split(text, max_bytes):
+    """没有合适边界时按字符切分"""
+    pieces, current = [], ""
+    for char in text:
+        if current and _byte_len(current + char) > max_bytes:
+            pieces.append(current)
+            current = ""
+        current += char
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _split_sentences(paragraph, max_bytes):
+    """把过长的段落按句子切分，仍然过长的句子按字符切分"""
+    units, start = [], 0
+    for match in _SENTENCE_END_RE.finditer(paragraph):
+        end = match.end()
+        if end > start:
+            units.append(paragraph[start:end])
+            start = end
+    if start < len(paragraph):
+        units.append(paragraph[start:])
+
+    result = []
+    for unit in units:
+        if _byte_len(unit) > max_bytes:
+            result.extend(_hard_split(unit, max_bytes))
+        else:
+            result.append(unit)
+    return result
+
+
+def split_document(text, max_bytes):
+    """切分文档
+
+    优先在段落边界切分，段落过长时在句子边界切分，并把相邻的小段合并到max_bytes以内。
+    各块按顺序拼接后与原文完全相同。
+    """
+    units = []
+    for match in _PARAGRAPH_RE.finditer(text):
+        paragraph = match.group()
+        if not paragraph:
+            continue
+        if _byte_len(paragraph) > max_bytes:
+            units.extend(_split_sentences(paragraph, max_bytes))
+        else:
+            units.append(paragraph)
+
+    chunks, current, current_bytes = [], "", 0
+    for unit in units:
+        size = _byte_len(unit)
+        if current and current_bytes + size > max_bytes:
+            chunks.append(current)
+            current, current_bytes = "", 0
+        current += unit
+        current_bytes += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def diff_range(old, new):
+    """计算把old改为new需要替换的最小区间
+
+    返回(start, end, replacement)：把old[start:end]替换为replacement即得到new。
+    用于原地修改显示中的译文，未改动的部分保持不动。
+    """
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end_old, end_new = len(old), len(new)
+    while end_old > start and end_new > start and old[end_old - 1] == new[end_new - 1]:
+        end_old -= 1
+        end_new -= 1
+    return start, end_old, new[start:end_new]
+
+
+class DocumentTranslator:
+    """长文档并发翻译
+
+    translate_many为批量翻译函数(segments, from_lang, to_lang, cache, priority) -> SegmentResult列表，
+    请求频率由其背后的共享限流器控制，priority为限流类别；
+    各块在线程池中并发翻译，每块完成后按原文顺序回调on_chunk，前面的段落可以先显示。
+    每个段落（行）作为独立的缓存条目，编辑文档后只有改动过的段落会发出请求。
+    线程池在第一次翻译时创建，之后的翻译复用同一批线程（及其中的数据库连接和HTTP状态），
+    不再使用时调用shutdown()。
+    """
+
+    def __init__(self, translate_many, max_bytes=6000, workers=4, cache=None, priority="bulk"):
+        self.translate_many = translate_many
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.cache = cache
+        self.priority = priority
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers))
+        return self._executor
+
+    def shutdown(self, wait=True):
+        """关闭线程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _translate_chunk(self, chunk, from_lang, to_lang, is_cancelled, cache, priority):
+        """翻译一块，返回(译文, 错误信息)"""
+        if is_cancelled is not None and is_cancelled():
+            return None, "翻译已取消"
+        # 首尾的空白和换行百度不会保留，单独记下来拼接时补回
+        body = chunk.strip()
+        if not body:
+            return chunk, None
+        head = chunk[:len(chunk) - len(chunk.lstrip())]
+        tail = chunk[len(chunk.rstrip()):]
+        # 按段落分别查缓存，未命中的段落由translate_many打包成一次请求
+        paragraphs = body.split("\n")
+        try:
+            results = self.translate_many(paragraphs, from_lang, to_lang, cache=cache, priority=priority)
+        except Exception as e:
+            return None, f"翻译过程出错: {str(e)}"
+        for result in results:
+            if result.error:
+                return None, result.error
+        return head + "\n".join(result.text for result in results) + tail, None
+
+    def translate(self, text, from_lang, to_lang, on_chunk=None, is_cancelled=None, cache=None, priority=None):
+        """翻译整个文档，返回(译文, 错误信息)
+
+        on_chunk(index, total, translated)按原文顺序调用，出错的块translated为None。
+        cache和priority不为None时代替构造时的设置，只对本次翻译有效。
+        """
+        cache = self.cache if cache is None else cache
+        priority = self.priority if priority is None else priority
+        chunks = split_document(text, self.max_bytes)
+        total = len(chunks)
+        if total == 0:
+            return "", None
+
+        results = [None] * total
+        done = [False] * total
+        next_index = 0
+        lock = threading.Lock()
+        # 所有块都已回调（future完成时回调可能尚未执行，不能只等待future）
+        all_done = threading.Event()
+        first_error = None
+
+        def finish(index, future):
+            nonlocal next_index, first_error
+            try:
+                translated, error = future.result()
+            except Exception as e:
+                translated, error = None, f"翻译过程出错: {str(e)}"
+            with lock:
+                results[index] = translated
+                done[index] = True
+                if error and first_error is None:
+                    first_error = error
+                # 按顺序回调已完成的前缀
+                while next_index < total and done[next_index]:
+                    if on_chunk is not None:
+                        on_chunk(next_index, total, results[next_index])
+                    next_index += 1
+                if next_index == total:
+                    all_done.set()
+
+        # 线程池中的请求耗时记入调用方的请求
+        translate_chunk = bind(self._translate_chunk)
+        executor = self._get_executor()
+        for index, chunk in enumerate(chunks):
+            future = executor.submit(translate_chunk, chunk, from_lang, to_lang, is_cancelled, cache, priority)
+            future.add_done_callback(lambda f, i=index: finish(i, f))
+        all_done.wait()
+
+        if first_error:
+            return None, first_error
+        return "".join(results), None
+
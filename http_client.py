@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+共享HTTP客户端
+按名称共享连接池（每个翻译服务商一个，OCR等共用默认的一个），按接口设置超时，并对可重试的请求做有限次数的退避重试
+"""
+
+import time
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+# 服务端临时错误，可重试
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class HTTPClient:
+    """带连接池的HTTP客户端
+
+    timeouts按接口名配置(连接超时, 读取超时)；
+    连接建立失败时请求尚未发出，总是可以重试；
+    读取超时和服务端临时错误只对幂等请求重试，重试间隔为带随机抖动的指数退避。
+    """
+
+    def __init__(self, pool_size=10, timeouts=None, max_retries=2, backoff=0.2, max_backoff=2.0):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeouts = {"default": (3, 10)}
+        self.timeouts.update(timeouts or {})
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # 统计信息
+        self.request_count = 0
+        self.retry_count = 0
+
+    def timeout_for(self, endpoint):
+        """返回接口的(连接超时, 读取超时)"""
+        return self.timeouts.get(endpoint, self.timeouts["default"])
+
+    def _backoff_delay(self, attempt):
+        """第attempt次重试前的等待时间（full jitter）"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** (attempt - 1))))
+
+    def request(self, method, url, endpoint="default", idempotent=None, **kwargs):
+        """发送请求，失败时按策略重试"""
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "OPTIONS")
+        kwargs.setdefault("timeout", self.timeout_for(endpoint))
+
+        attempt = 0
+        while True:
+            self.request_count += 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if not (idempotent and response.status_code in RETRY_STATUS
+                        and attempt < self.max_retries):
+                    return response
+            except requests.exceptions.ConnectTimeout:
+                if attempt >= self.max_retries:
+                    raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            self.retry_count += 1
+            time.sleep(self._backoff_delay(attempt))
+
+    def get(self, url, endpoint="default", **kwargs):
+        return self.request("GET", url, endpoint=endpoint, **kwargs)
+
+    def post(self, url, endpoint="default", **kwargs):
+        return self.request("POST", url, endpoint=endpoint, **kwargs)
+
+    def warm_up(self, urls):
+        """预先建立连接（TCP和TLS握手），连接保留在连接池中供后续请求复用"""
+        for url in urls:
+            try:
+                self.session.head(url, timeout=self.timeout_for("default"))
+            except requests.exceptions.RequestException:
+                pass
+
+
+_clients = {}
+_client_lock = threading.Lock()
+
+
+def get_client(name="default"):
+    """返回进程内共享的HTTP客户端
+
+    每个翻译服务商使用独立的客户端（各自的连接池），OCR和翻译服务使用默认客户端。
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _client_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = HTTPClient(pool_size=config.HTTP_POOL_SIZE,
+                                    timeouts=config.HTTP_TIMEOUTS,
+                                    max_retries=config.HTTP_MAX_RETRIES,
+                                    backoff=config.HTTP_RETRY_BACKOFF)
+                _clients[name] = client
+    return client
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+共享图像缓冲区
+截图数据只保存一份连续内存，选择窗口、剪贴板、感知哈希、OCR预处理和编码都通过视图访问，
+裁剪得到的是带步长的视图而不是副本；整块像素被复制时计入统计，便于检查是否引入了多余的复制
+"""
+
+import threading
+
+_stats_lock = threading.Lock()
+_copy_stats = {"copies": 0, "bytes": 0, "reasons": {}}
+
+
+def _count_copy(reason, nbytes):
+    with _stats_lock:
+        _copy_stats["copies"] += 1
+        _copy_stats["bytes"] += nbytes
+        _copy_stats["reasons"][reason] = _copy_stats["reasons"].get(reason, 0) + 1
+
+
+def copy_stats():
+    """返回累计的像素复制次数、字节数和各原因的次数"""
+    with _stats_lock:
+        return {"copies": _copy_stats["copies"], "bytes": _copy_stats["bytes"],
+                "reasons": dict(_copy_stats["reasons"])}
+
+
+def reset_copy_stats():
+    with _stats_lock:
+        _copy_stats["copies"] = 0
+        _copy_stats["bytes"] = 0
+        _copy_stats["reasons"] = {}
+
+
+class ImageBuffer:
+    """一块连续内存上的RGB或RGBA图像
+
+    array为(高, 宽, 通道)的uint8数组，可以是更大图像的视图（行步长大于宽度 * 通道数）；
+    视图通过base引用原图，原图内存在所有视图释放后才会回收，origin为视图左上角在原图中的坐标。
+    由缓冲区派生的灰度图会被缓存，感知哈希和OCR预处理共用。
+    """
+
+    def __init__(self, array, base=None, origin=(0, 0)):
+        self.array = array
+        self.base = base
+        self.origin = origin
+        self._gray = None
+
+    @classmethod
+    def from_pil(cls, image):
+        """从PIL图像创建（唯一一次整块复制）"""
+        import numpy as np
+
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        array = np.ascontiguousarray(np.asarray(image))
+        _count_copy("from_pil", array.nbytes)
+        return cls(array)
+
+    @classmethod
+    def wrap(cls, image):
+        """ImageBuffer原样返回，PIL图像转换为ImageBuffer"""
+        if isinstance(image, cls):
+            return image
+        return cls.from_pil(image)
+
+    @property
+    def width(self):
+        return self.array.shape[1]
+
+    @property
+    def height(self):
+        return self.array.shape[0]
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def channels(self):
+        return self.array.shape[2]
+
+    @property
+    def bytes_per_line(self):
+        return self.array.strides[0]
+
+    @property
+    def nbytes(self):
+        return self.width * self.height * self.channels
+
+    def crop(self, left, top, right, bottom):
+        """裁剪，返回共享内存的视图"""
+        left, right = max(0, left), min(self.width, right)
+        top, bottom = max(0, top), min(self.height, bottom)
+        base = self.base if self.base is not None else self
+        origin = (self.origin[0] + left, self.origin[1] + top)
+        region = ImageBuffer(self.array[top:bottom, left:right], base=base, origin=origin)
+        # 整行裁剪时灰度图的切片仍是连续内存，直接共用已计算的灰度图
+        if self._gray is not None and left == 0 and right == self.width:
+            region._gray = self._gray[top:bottom]
+        return region
+
+    def copy(self, reason="copy"):
+        """显式复制为独立的连续内存"""
+        import numpy as np
+
+        array = np.array(self.array, order="C")
+        _count_copy(reason, array.nbytes)
+        return ImageBuffer(array)
+
+    def qimage(self):
+        """返回直接引用这块内存的QImage（不复制），调用方需保证缓冲区比QImage存活得久"""
+        from PyQt5 import sip
+        from PyQt5.QtGui import QImage
+
+        fmt = QImage.Format_RGB888 if self.channels == 3 else QImage.Format_RGBA8888
+        image = QImage(sip.voidptr(self.array.ctypes.data), self.width, self.height,
+                       self.bytes_per_line, fmt)
+        # QImage不持有Python对象，挂上引用防止缓冲区先被回收
+        image._buffer = self
+        return image
+
+    def qimage_copy(self, reason="qimage"):
+        """返回拥有独立内存的QImage，用于会比缓冲区存活得久的场合（如剪贴板）"""
+        image = self.qimage().copy()
+        _count_copy(reason, self.nbytes)
+        return image
+
+    def gray(self):
+        """灰度图（ITU-R 601-2亮度，与PIL的convert("L")相同），派生数据，计算一次后缓存"""
+        if self._gray is None:
+            import numpy as np
+
+            a = self.array
+            gray = a[..., 0].astype(np.uint32) * 19595
+            gray += a[..., 1].astype(np.uint32) * 38470
+            gray += a[..., 2].astype(np.uint32) * 7471
+            gray += 0x8000
+            gray >>= 16
+            self._gray = gray.astype(np.uint8)
+        return self._gray
+
+    def pil_gray(self):
+        """灰度图的PIL视图（共享内存），供缩放和编码使用"""
+        from PIL import Image
+
+        gray = self.gray()
+        return Image.frombuffer("L", (gray.shape[1], gray.shape[0]), gray, "raw", "L", 0, 1)
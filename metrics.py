@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能监控
+记录截图和翻译流程中每个阶段的耗时，保留最近的请求明细供查看，
+并把滚动窗口内的分位数以Prometheus文本格式导出到本地文件
+"""
+
+import os
+import time
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import config
+
+# 导出的分位数
+QUANTILES = (0.5, 0.9, 0.99)
+
+_local = threading.local()
+_trace_ids = itertools.count(1)
+
+
+class Trace:
+    """一次请求（截图或翻译）的各阶段耗时
+
+    span()用于同一段代码内的阶段；begin()/end()用于跨越事件回调的阶段，如等待窗口最小化。
+    阶段可以在不同线程中记录，finish()后交给统计并不再记录。
+    """
+
+    def __init__(self, pipeline, registry):
+        self.pipeline = pipeline
+        self.registry = registry
+        self.id = next(_trace_ids)
+        self.started_at = time.time()
+        self.status = None
+        self.total = None
+        self.spans = []
+        self._t0 = time.perf_counter()
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, start, seconds):
+        """记录一个阶段，start为time.perf_counter()的读数"""
+        with self._lock:
+            if self.status is None:
+                self.spans.append((stage, start - self._t0, seconds))
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(stage, start, time.perf_counter() - start)
+
+    def begin(self, stage):
+        with self._lock:
+            self._open[stage] = time.perf_counter()
+
+    def end(self, stage):
+        with self._lock:
+            start = self._open.pop(stage, None)
+        if start is not None:
+            self.add(stage, start, time.perf_counter() - start)
+
+    def finish(self, status="ok"):
+        """结束请求，未结束的阶段被丢弃"""
+        with self._lock:
+            if self.status is not None:
+                return
+            self.status = status
+            self.total = time.perf_counter() - self._t0
+            self._open.clear()
+        self.registry.record(self)
+
+    def breakdown(self):
+        """按时间顺序列出各阶段的耗时"""
+        total = self.total if self.total is not None else time.perf_counter() - self._t0
+        lines = [f"#{self.id} {self.pipeline} {time.strftime('%H:%M:%S', time.localtime(self.started_at))} "
+                 f"共{total * 1000:.0f}ms ({self.status or '进行中'})"]
+        for stage, offset, seconds in sorted(self.spans, key=lambda item: item[1]):
+            lines.append(f"    {stage:<14} +{offset * 1000:7.0f}ms  {seconds * 1000:8.1f}ms")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """各阶段耗时的滚动窗口统计
+
+    每个(流程, 阶段)保留最近window个样本计算分位数，次数和总耗时为累计值；
+    每隔export_interval秒在请求结束时把统计写入path（Prometheus文本格式）。
+    """
+
+    def __init__(self, window=500, path=None, export_interval=15, recent=50, enabled=True):
+        self.window = window
+        self.path = path
+        self.export_interval = export_interval
+        self.enabled = enabled
+        self._samples = {}
+        self._totals = {}
+        self._statuses = {}
+        self._recent = deque(maxlen=recent)
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+
+    def start_trace(self, pipeline):
+        return Trace(pipeline, self)
+
+    def record(self, trace):
+        if not self.enabled:
+            return
+        with self._lock:
+            for stage, _, seconds in trace.spans + [("total", 0.0, trace.total)]:
+                key = (trace.pipeline, stage)
+                samples = self._samples.get(key)
+                if samples is None:
+                    samples = self._samples[key] = deque(maxlen=self.window)
+                    self._totals[key] = [0, 0.0]
+                samples.append(seconds)
+                self._totals[key][0] += 1
+                self._totals[key][1] += seconds
+            status_key = (trace.pipeline, trace.status)
+            self._statuses[status_key] = self._statuses.get(status_key, 0) + 1
+            self._recent.append(trace)
+        if self.path and time.monotonic() - self._last_export >= self.export_interval:
+            self.export()
+
+    def recent_traces(self, count=10):
+        with self._lock:
+            return list(self._recent)[-count:]
+
+    def quantiles(self):
+        """返回{(流程, 阶段): {分位数: 秒}}"""
+        with self._lock:
+            snapshot = {key: sorted(samples) for key, samples in self._samples.items()}
+        return {key: {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
+                for key, samples in snapshot.items()}
+
+    def summary(self):
+        """各阶段分位数的文字汇总"""
+        lines = []
+        for (pipeline, stage), values in sorted(self.quantiles().items()):
+            lines.append(f"{pipeline}/{stage}: " + "  ".join(
+                f"p{int(q * 100)} {seconds * 1000:.0f}ms" for q, seconds in values.items()))
+        return "\n".join(lines)
+
+    def render(self):
+        """以Prometheus文本格式输出统计"""
+        quantiles = self.quantiles()
+        with self._lock:
+            totals = {key: list(value) for key, value in self._totals.items()}
+            statuses = dict(self._statuses)
+
+        lines = ["# HELP translator_stage_seconds Duration of each pipeline stage over a rolling window.",
+                 "# TYPE translator_stage_seconds summary"]
+        for key in sorted(quantiles):
+            labels = f'pipeline="{key[0]}",stage="{key[1]}"'
+            for q, seconds in quantiles[key].items():
+                lines.append(f'translator_stage_seconds{{{labels},quantile="{q}"}} {seconds:.6f}')
+            count, total = totals[key]
+            lines.append(f"translator_stage_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"translator_stage_seconds_count{{{labels}}} {count}")
+        lines.append("# HELP translator_requests_total Finished requests by pipeline and status.")
+        lines.append("# TYPE translator_requests_total counter")
+        for (pipeline, status), count in sorted(statuses.items()):
+            lines.append(f'translator_requests_total{{pipeline="{pipeline}",status="{status}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path=None):
+        """写入统计文件（先写临时文件再替换，抓取时不会读到写了一半的文件）"""
+        path = path or self.path
+        if not path:
+            return
+        self._last_export = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(temp_path, path)
+        except OSError:
+            pass
+
+
+@contextmanager
+def activate(trace):
+    """在当前线程中把trace设为当前请求，底层模块通过span()记录阶段"""
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+def bind(func):
+    """把当前线程的请求绑定到func，提交到线程池后func中记录的阶段仍属于该请求"""
+    trace = current_trace()
+    if trace is None:
+        return func
+
+    def run(*args, **kwargs):
+        with activate(trace):
+            return func(*args, **kwargs)
+    return run
+
+
+@contextmanager
+def span(stage):
+    """在当前线程的请求中记录一个阶段，没有当前请求时什么也不做"""
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+    with trace.span(stage):
+        yield trace
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics():
+    """返回进程内共享的统计"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry(window=config.METRICS_WINDOW,
+                                            path=config.METRICS_PATH,
+                                            export_interval=config.METRICS_EXPORT_INTERVAL,
+                                            enabled=config.METRICS_ENABLED)
+    return _registry
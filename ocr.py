@@ -0,0 +1,518 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+百度OCR相关功能
+access_token的获取、缓存和提前刷新，上传前的图像预处理，按感知哈希缓存识别结果，
+以及把这些步骤串起来的识别流程（图形界面和服务模式共用）；过高的截图分块并发识别
+"""
+
+import io
+import os
+import base64
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import config
+import metrics
+from http_client import get_client
+from image_buffer import ImageBuffer
+from ocr_tiles import split_rows, merge_lines
+
+TOKEN_URL = "https://aip.baidubce.com/oauth/2.0/token"
+OCR_URL = "https://aip.baidubce.com/rest/2.0/ocr/v1/general_basic"
+
+
+class OCRAuthError(Exception):
+    """获取OCR access_token失败"""
+
+
+class TokenManager:
+    """百度OCR access_token管理器
+
+    token在过期前一直复用，并保存到本地文件，重启后无需重新获取；
+    距离过期不足refresh_margin秒时在后台线程提前刷新；
+    多个OCR任务同时需要新token时只发起一次请求，其他任务等待共享结果。
+    """
+
+    def __init__(self, api_key, secret_key, cache_path=None, refresh_margin=86400):
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        # 单独的锁保护后台刷新标记，避免检查标记时等待正在进行的请求
+        self._refresh_flag_lock = threading.Lock()
+        self._refreshing = False
+        # 统计信息
+        self.fetch_count = 0
+        self.hit_count = 0
+        self._load()
+
+    @property
+    def _fingerprint(self):
+        """API密钥的指纹，密钥变更后本地保存的token自动失效"""
+        return hashlib.sha1(f"{self.api_key}:{self.secret_key}".encode()).hexdigest()
+
+    def _load(self):
+        """从本地文件读取token"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("fingerprint") == self._fingerprint:
+                self._token = data["access_token"]
+                self._expires_at = float(data["expires_at"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _save(self):
+        """把token保存到本地文件"""
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "fingerprint": self._fingerprint,
+                    "access_token": self._token,
+                    "expires_at": self._expires_at,
+                }, f)
+            try:
+                os.chmod(tmp_path, 0o600)
+            except OSError:
+                pass
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def _fetch(self):
+        """请求新的token，调用方需持有锁"""
+        self.fetch_count += 1
+        params = {
+            "grant_type": "client_credentials",
+            "client_id": self.api_key,
+            "client_secret": self.secret_key,
+        }
+        try:
+            response = get_client().get(TOKEN_URL, endpoint="token", params=params)
+            response_json = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise OCRAuthError(str(e))
+
+        access_token = response_json.get("access_token")
+        if not access_token:
+            raise OCRAuthError(str(response_json))
+
+        self._token = access_token
+        # 百度的token有效期一般为30天
+        self._expires_at = time.time() + int(response_json.get("expires_in", 2592000))
+        self._save()
+
+    def _is_valid(self, now):
+        return self._token is not None and now < self._expires_at - 60
+
+    def get_token(self):
+        """返回可用的token，必要时获取新token"""
+        now = time.time()
+        if self._is_valid(now):
+            self.hit_count += 1
+            if now > self._expires_at - self.refresh_margin:
+                self.refresh_in_background()
+            return self._token
+
+        with self._lock:
+            # 等待期间其他线程可能已经获取了新token
+            if not self._is_valid(time.time()):
+                self._fetch()
+            else:
+                self.hit_count += 1
+            return self._token
+
+    def refresh_in_background(self):
+        """在后台线程刷新token，已有刷新在进行时不重复发起"""
+        with self._refresh_flag_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                with self._lock:
+                    self._fetch()
+            except OCRAuthError:
+                pass
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def prefetch(self):
+        """启动时预先准备token，本地已有有效token时不发请求"""
+        if not self._is_valid(time.time()) or time.time() > self._expires_at - self.refresh_margin:
+            self.refresh_in_background()
+
+    def invalidate(self):
+        """服务端报告token无效时调用，下次使用时重新获取"""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0
+
+
+class ImagePreprocessor:
+    """OCR上传前的图像预处理
+
+    转为灰度图，在不影响识别的前提下缩小分辨率，
+    再选择PNG或JPEG编码，使数据量不超过目标大小和百度接口的限制。
+    """
+
+    # 百度通用文字识别的限制：最短边至少15像素，最长边不超过4096像素，base64编码后不超过4MB
+    MIN_SIDE = 15
+    MAX_SIDE = 4096
+    MAX_BYTES = 4 * 1024 * 1024 * 3 // 4
+    JPEG_QUALITIES = (90, 80, 70, 60)
+
+    def __init__(self, target_bytes=512 * 1024, max_side=2560, min_scale=0.5):
+        self.target_bytes = target_bytes
+        self.max_side = min(max_side, self.MAX_SIDE)
+        self.min_scale = min_scale
+        # 统计信息
+        self.request_count = 0
+        self.raw_bytes_total = 0
+        self.sent_bytes_total = 0
+
+    def _encode(self, image, fmt, quality=None):
+        buffer = io.BytesIO()
+        if fmt == "JPEG":
+            image.save(buffer, format="JPEG", quality=quality, optimize=False)
+        else:
+            # 压缩级别1速度最快，文字截图的压缩率与默认级别相差不大
+            image.save(buffer, format="PNG", compress_level=1)
+        return buffer.getvalue()
+
+    def _resize(self, image, scale):
+        from PIL import Image
+        width, height = image.size
+        size = (max(self.MIN_SIDE, int(width * scale)), max(self.MIN_SIDE, int(height * scale)))
+        if size == image.size:
+            return image
+        return image.resize(size, Image.LANCZOS)
+
+    def process(self, image):
+        """处理图像（ImageBuffer或PIL图像），返回(编码后的数据, 处理信息)"""
+        start = time.perf_counter()
+        buffer = ImageBuffer.wrap(image)
+        original_size = buffer.size
+        raw_bytes = buffer.nbytes
+
+        # 灰度图由缓冲区派生（与感知哈希共用），以PIL视图交给缩放和编码，不再复制原图
+        gray = buffer.pil_gray()
+
+        # 超过max_side时缩小，但缩小不超过min_scale，以免小字无法识别
+        longest = max(gray.size)
+        scale = 1.0
+        if longest > self.max_side:
+            scale = max(self.max_side / longest, self.min_scale)
+        # 百度接口的硬性限制
+        scale = min(scale, self.MAX_SIDE / longest)
+        if min(gray.size) * scale < self.MIN_SIDE:
+            scale = self.MIN_SIDE / min(gray.size)
+        gray = self._resize(gray, scale)
+
+        while True:
+            data = self._encode(gray, "PNG")
+            fmt = "PNG"
+            if len(data) > self.target_bytes:
+                for quality in self.JPEG_QUALITIES:
+                    jpeg = self._encode(gray, "JPEG", quality)
+                    if len(jpeg) < len(data):
+                        data, fmt = jpeg, f"JPEG({quality})"
+                    if len(data) <= self.target_bytes:
+                        break
+            # 仍超过接口限制时继续缩小
+            if len(data) <= self.MAX_BYTES or min(gray.size) <= self.MIN_SIDE:
+                break
+            gray = self._resize(gray, 0.8)
+
+        self.request_count += 1
+        self.raw_bytes_total += raw_bytes
+        self.sent_bytes_total += len(data)
+
+        info = {
+            "format": fmt,
+            "original_size": original_size,
+            "size": gray.size,
+            "raw_bytes": raw_bytes,
+            "bytes": len(data),
+            "saved_bytes": raw_bytes - len(data),
+            "elapsed": time.perf_counter() - start,
+        }
+        return data, info
+
+    def stats(self):
+        """返回累计的预处理统计信息"""
+        return {
+            "requests": self.request_count,
+            "raw_bytes": self.raw_bytes_total,
+            "sent_bytes": self.sent_bytes_total,
+            "saved_bytes": self.raw_bytes_total - self.sent_bytes_total,
+        }
+
+
+def dhash(image, hash_size=16):
+    """计算图像（ImageBuffer或PIL图像）的差值哈希(dHash)
+
+    缩小为(hash_size + 1) x hash_size的灰度图，比较每行相邻像素的明暗，
+    得到hash_size * hash_size位的整数。内容相近的图像哈希值的汉明距离很小。
+    """
+    # NumPy和PIL只在截图识别时才需要，延迟导入以加快程序启动
+    import numpy as np
+    from PIL import Image
+
+    small = ImageBuffer.wrap(image).pil_gray().resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class OCRResultCache:
+    """按感知哈希缓存OCR识别结果
+
+    重复截取同一对话框或字幕区域时，哈希的汉明距离不超过threshold即视为同一内容，
+    直接返回缓存的识别文本。尺寸相差较大的截图不会相互匹配。
+    """
+
+    # 截图宽高允许的差异（像素），框选时难免有几个像素的偏差
+    SIZE_TOLERANCE = 8
+
+    def __init__(self, max_entries=64, threshold=6, hash_size=16):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hash_size = hash_size
+        # (哈希, 宽, 高) -> 识别文本，按最近使用排序
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, image):
+        """计算缓存键"""
+        return (dhash(image, self.hash_size), image.width, image.height)
+
+    def get(self, fingerprint):
+        """查找相近的截图，返回缓存的文本或None"""
+        image_hash, width, height = fingerprint
+        with self._lock:
+            best_key, best_distance = None, self.threshold + 1
+            for key in self._entries:
+                cached_hash, cached_width, cached_height = key
+                if (abs(cached_width - width) > self.SIZE_TOLERANCE
+                        or abs(cached_height - height) > self.SIZE_TOLERANCE):
+                    continue
+                distance = hamming_distance(cached_hash, image_hash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key]
+
+    def put(self, fingerprint, text):
+        with self._lock:
+            self._entries[fingerprint] = text
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class OCREngine:
+    """百度通用文字识别流程
+
+    依次经过：感知哈希结果缓存 -> 获取access_token -> 图像预处理 -> 上传识别。
+    高度超过tile_min_height的截图按空白行切成不超过tile_height的块，由tile_workers个线程并发识别后合并。
+    出错时与原来一样返回以"OCR"开头的错误信息文本。
+    """
+
+    def __init__(self, token_manager, preprocessor, result_cache,
+                 tile_min_height=0, tile_height=1000, tile_overlap=48, tile_workers=3):
+        self.token_manager = token_manager
+        self.preprocessor = preprocessor
+        self.result_cache = result_cache
+        self.tile_min_height = tile_min_height
+        self.tile_height = tile_height
+        self.tile_overlap = min(tile_overlap, tile_height // 2)
+        self.tile_workers = tile_workers
+
+    @classmethod
+    def from_config(cls):
+        """按config.py中的设置创建"""
+        return cls(TokenManager(config.BAIDU_OCR_API_KEY, config.BAIDU_OCR_SECRET_KEY,
+                                config.OCR_TOKEN_CACHE_PATH),
+                   ImagePreprocessor(config.OCR_TARGET_KB * 1024, config.OCR_MAX_SIDE,
+                                     config.OCR_MIN_SCALE),
+                   OCRResultCache(config.OCR_CACHE_SIZE, config.OCR_HASH_THRESHOLD),
+                   tile_min_height=config.OCR_TILE_MIN_HEIGHT, tile_height=config.OCR_TILE_HEIGHT,
+                   tile_overlap=config.OCR_TILE_OVERLAP, tile_workers=config.OCR_TILE_WORKERS)
+
+    @staticmethod
+    def credentials_error():
+        """检查OCR API密钥，未配置时返回提示信息"""
+        api_key = config.BAIDU_OCR_API_KEY
+        secret_key = config.BAIDU_OCR_SECRET_KEY
+        if (not api_key or not secret_key
+                or api_key == "YOUR_OCR_API_KEY" or secret_key == "YOUR_OCR_SECRET_KEY"):
+            return "请在config.py中配置百度OCR API的API_KEY和SECRET_KEY"
+        return None
+
+    def _upload(self, image_base64, access_token):
+        params = {"image": image_base64}
+        headers = {'content-type': 'application/x-www-form-urlencoded'}
+        response = get_client().post(OCR_URL, endpoint="ocr", data=params, headers=headers,
+                                     params={"access_token": access_token})
+        return response.json()
+
+    def split(self, image):
+        """需要分块识别时返回各块的(top, bottom)，否则返回只有一块的列表"""
+        if not self.tile_min_height or image.height <= self.tile_min_height:
+            return [(0, image.height)]
+        return split_rows(image.gray(), self.tile_height, self.tile_overlap)
+
+    def _recognize_tile(self, tile):
+        """识别一块，返回(识别结果, 预处理信息)；token失效时重新获取并重试一次"""
+        img_data, info = self.preprocessor.process(tile)
+        img = base64.b64encode(img_data)
+        result = self._upload(img, self.token_manager.get_token())
+        if result.get("error_code") in (110, 111):
+            self.token_manager.invalidate()
+            result = self._upload(img, self.token_manager.get_token())
+        return result, info
+
+    def _recognize_tiles(self, image, tiles):
+        """并发识别各块，返回(各块的识别结果, 汇总的预处理信息)"""
+        regions = [image.crop(0, top, image.width, bottom) for top, bottom in tiles]
+        with ThreadPoolExecutor(max_workers=max(1, min(self.tile_workers, len(regions)))) as executor:
+            outcomes = list(executor.map(metrics.bind(self._recognize_tile), regions))
+
+        infos = [info for _, info in outcomes]
+        info = {
+            "format": f"{len(tiles)}块 {infos[0]['format']}",
+            "original_size": image.size,
+            "size": infos[0]["size"],
+            "raw_bytes": sum(item["raw_bytes"] for item in infos),
+            "bytes": sum(item["bytes"] for item in infos),
+            "saved_bytes": sum(item["saved_bytes"] for item in infos),
+            "elapsed": sum(item["elapsed"] for item in infos),
+            "tiles": len(tiles),
+        }
+        return [result for result, _ in outcomes], info
+
+    def recognize(self, image, encoded=None):
+        """识别图像中的文字，返回(文本或错误信息, 预处理信息)
+
+        encoded为已经预处理并编码过的上传数据（image由其解码而来）时原样上传，
+        不再分块和重新编码，image只用于结果缓存。
+        命中结果缓存、在预处理前出错或使用encoded时，预处理信息为None。
+        """
+        error = self.credentials_error()
+        if error:
+            return error, None
+
+        try:
+            # 检查图像是否为空
+            if image is None:
+                return "图像为空，无法进行OCR识别", None
+            # 哈希和预处理共用同一个缓冲区和灰度图
+            image = ImageBuffer.wrap(image)
+
+            # 相近的截图之前识别过，直接返回缓存结果
+            with metrics.span("ocr_cache"):
+                fingerprint = self.result_cache.fingerprint(image)
+                cached_text = self.result_cache.get(fingerprint)
+            if cached_text is not None:
+                return cached_text, None
+
+            # 获取access_token（已缓存的token直接复用）
+            try:
+                with metrics.span("token"):
+                    access_token = self.token_manager.get_token()
+            except OCRAuthError as e:
+                return f"OCR认证失败: {str(e)}", None
+
+            # 过高的截图分块并发识别，避免超过接口限制或缩小到看不清小字
+            tiles = self.split(image) if encoded is None else [(0, image.height)]
+            if len(tiles) > 1:
+                try:
+                    with metrics.span("ocr_tiles"):
+                        results, info = self._recognize_tiles(image, tiles)
+                except OCRAuthError as e:
+                    return f"OCR认证失败: {str(e)}", None
+                for result in results:
+                    if "words_result" not in result:
+                        return f"OCR识别失败: {result.get('error_msg', '未知错误')}", info
+                # 按从上到下的顺序合并，去掉相邻块重叠部分重复识别的行
+                lines = merge_lines(tiles, [[item["words"] for item in result["words_result"]]
+                                            for result in results])
+                text = "\n".join(lines).strip()
+                if text:
+                    self.result_cache.put(fingerprint, text)
+                return text, info
+
+            try:
+                # 预处理：灰度、缩放，并选择合适的编码以减小上传数据量
+                with metrics.span("encode"):
+                    if encoded is None:
+                        img_data, info = self.preprocessor.process(image)
+                    else:
+                        img_data, info = encoded, None
+                    img = base64.b64encode(img_data)
+            except Exception as save_error:
+                return f"OCR处理图像出错: {str(save_error)}", None
+
+            # 调用通用文字识别API
+            with metrics.span("ocr_upload"):
+                result = self._upload(img, access_token)
+
+            # token失效或过期时重新获取并重试一次
+            if result.get("error_code") in (110, 111):
+                self.token_manager.invalidate()
+                try:
+                    access_token = self.token_manager.get_token()
+                except OCRAuthError as e:
+                    return f"OCR认证失败: {str(e)}", info
+                with metrics.span("ocr_upload"):
+                    result = self._upload(img, access_token)
+
+            # 提取文本
+            if "words_result" in result:
+                text = "\n".join(item["words"] for item in result["words_result"]).strip()
+                if text:
+                    self.result_cache.put(fingerprint, text)
+                return text, info
+            return f"OCR识别失败: {result.get('error_msg', '未知错误')}", info
+        except Exception as e:
+            return f"OCR API调用出错: {str(e)}", None
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+大截图分块识别
+按行投影找出没有文字的空白行，把过高的截图在空白处切成若干块分别识别，
+找不到空白时按固定高度切分并让相邻块重叠；识别结果按块的顺序合并，并去掉重叠部分重复的行
+"""
+
+import difflib
+
+# 相邻像素的亮度差超过该值视为文字边缘
+EDGE_THRESHOLD = 24
+# 一行中边缘像素的比例不超过该值视为空白行
+BLANK_RATIO = 0.002
+# 在块高度的后半段内寻找空白行作为切分位置
+SEARCH_FRACTION = 0.5
+# 重叠块之间最多比较的行数
+MAX_OVERLAP_LINES = 3
+# 两行相似度达到该值视为同一行
+LINE_SIMILARITY = 0.8
+
+
+def blank_rows(gray):
+    """返回每一行是否为空白的布尔数组（gray为(高, 宽)的灰度数组）
+
+    统计每行相邻像素的亮度突变数，纯色或渐变的背景没有突变，文字行有大量突变。
+    """
+    import numpy as np
+
+    edges = np.abs(np.diff(gray.astype(np.int16), axis=1)) > EDGE_THRESHOLD
+    return edges.sum(axis=1) <= max(1, int(gray.shape[1] * BLANK_RATIO))
+
+
+def split_rows(gray, tile_height, overlap):
+    """把图像按行切成若干块，返回[(top, bottom), ...]
+
+    每块不超过tile_height行，优先在块后半段中最靠下的空白行处切开（相邻块不重叠）；
+    找不到空白行时在tile_height处硬切，下一块向上重叠overlap行，保证被切断的文字行完整出现在其中一块。
+    """
+    height = gray.shape[0]
+    if height <= tile_height:
+        return [(0, height)]
+
+    blank = blank_rows(gray)
+    tiles = []
+    top = 0
+    while height - top > tile_height:
+        limit = top + tile_height
+        low = top + int(tile_height * SEARCH_FRACTION)
+        cut = None
+        for row in range(limit - 1, low - 1, -1):
+            if blank[row]:
+                cut = row
+                break
+        if cut is not None:
+            tiles.append((top, cut + 1))
+            top = cut + 1
+        else:
+            tiles.append((top, limit))
+            top = limit - overlap
+    tiles.append((top, height))
+    return tiles
+
+
+def _same_line(a, b):
+    a, b = a.strip(), b.strip()
+    if not a or not b:
+        return a == b
+    if a in b or b in a:
+        return True
+    return difflib.SequenceMatcher(None, a, b).ratio() >= LINE_SIMILARITY
+
+
+def merge_lines(tiles, tile_lines):
+    """按块的顺序合并各块识别出的文字行
+
+    tiles为split_rows()的结果，tile_lines为每块识别出的行列表。相互重叠的两块，
+    前一块末尾和后一块开头相同（或相近）的行只保留一次，取较长（较完整）的一个。
+    """
+    merged = []
+    previous_bottom = None
+    for (top, bottom), lines in zip(tiles, tile_lines):
+        lines = list(lines)
+        if merged and previous_bottom is not None and top < previous_bottom:
+            for count in range(min(MAX_OVERLAP_LINES, len(merged), len(lines)), 0, -1):
+                tail = merged[-count:]
+                if all(_same_line(a, b) for a, b in zip(tail, lines[:count])):
+                    for index, (a, b) in enumerate(zip(tail, lines[:count])):
+                        merged[len(merged) - count + index] = max(a, b, key=len)
+                    lines = lines[count:]
+                    break
+        merged.extend(lines)
+        previous_bottom = bottom
+    return merged
@@ -0,0 +1,480 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+翻译服务商
+百度和有道翻译接口的统一封装：各自的语言代码映射、限流器和连接池；
+按实测延迟和错误率选择服务商，某个服务商变慢、出错或额度用尽时自动切换到其他服务商
+"""
+
+import time
+import uuid
+import random
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+import config
+import metrics
+from http_client import get_client
+from rate_limit import get_limiter
+
+# 延迟和错误率的指数移动平均系数
+EWMA_ALPHA = 0.2
+# 还没有实测数据时假定的延迟（秒）
+DEFAULT_LATENCY = 0.5
+# 计算延迟分位数时保留的最近请求数，以及至少需要的样本数
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+
+class TranslationProvider(ABC):
+    """翻译服务商基类
+
+    子类实现credentials_error()、max_query_bytes()和_send()；语言代码统一使用config.LANGUAGES中的（百度的）代码，
+    由map_language()转换为本服务商的代码，不支持的语言返回None。
+    """
+
+    name = ""
+    URL = ""
+    # 频率受限的错误码：降速退避后重试
+    THROTTLE_CODES = ()
+    # 额度用尽或账号不可用的错误码：较长时间内不再使用
+    UNAVAILABLE_CODES = ()
+    # config.LANGUAGES中的语言代码 -> 本服务商的语言代码
+    LANGUAGE_CODES = {}
+
+    def __init__(self):
+        # 每个服务商使用独立的连接池和限流器
+        self.client = get_client(self.name)
+        self.limiter = get_limiter(self.name)
+        self._lock = threading.Lock()
+        self.latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        # 统计信息
+        self.call_count = 0
+        self.failure_count = 0
+
+    @abstractmethod
+    def credentials_error(self):
+        """检查密钥，未配置时返回提示信息"""
+
+    @abstractmethod
+    def max_query_bytes(self):
+        """单次请求的文本字节上限"""
+
+    def map_language(self, code):
+        return self.LANGUAGE_CODES.get(code)
+
+    @abstractmethod
+    def _send(self, lines, from_lang, to_lang):
+        """发送一次请求，返回(每行译文的列表, 错误码, 错误信息)"""
+
+    def request(self, lines, from_lang, to_lang, priority="interactive", cancel=None):
+        """经过限流器发送请求，返回(每行译文的列表, 错误码, 错误信息)
+
+        服务端报告频率受限时降低速率，退避后重新排队；最终结果计入延迟和错误率统计。
+        cancel为可选的threading.Event，设置后不再排队或重试（已发出的请求无法撤回，其结果被丢弃）。
+        """
+        from_code = self.map_language(from_lang)
+        to_code = self.map_language(to_lang)
+        attempt = 0
+        while True:
+            with metrics.span("rate_limit"):
+                acquired = self.limiter.acquire(priority, cancel)
+            if not acquired or (cancel is not None and cancel.is_set()):
+                return None, None, "翻译已取消"
+            self.call_count += 1
+            with metrics.span(f"{self.name}_request"):
+                start = time.perf_counter()
+                translated_parts, error_code, error = self._send(lines, from_code, to_code)
+                elapsed = time.perf_counter() - start
+            self.limiter.record_network(elapsed)
+            if error_code in self.THROTTLE_CODES and attempt < config.RATE_LIMIT_MAX_RETRIES:
+                self.limiter.penalize()
+                self.limiter.backoff(attempt, priority)
+                attempt += 1
+                continue
+            if error is None:
+                self.limiter.report_success()
+            self.record(elapsed, error_code, error)
+            return translated_parts, error_code, error
+
+    def record(self, seconds, error_code, error):
+        """记录一次请求的结果，连续失败或额度用尽时暂停使用"""
+        with self._lock:
+            self._latencies.append(seconds)
+            self.latency = seconds if self.latency is None else (
+                self.latency + EWMA_ALPHA * (seconds - self.latency))
+            if error is None:
+                self.error_rate *= 1 - EWMA_ALPHA
+                self.consecutive_failures = 0
+                return
+            self.failure_count += 1
+            self.error_rate += EWMA_ALPHA * (1 - self.error_rate)
+            self.consecutive_failures += 1
+            now = time.monotonic()
+            if error_code in self.UNAVAILABLE_CODES:
+                self.cooldown_until = now + config.PROVIDER_QUOTA_COOLDOWN
+            elif self.consecutive_failures >= config.PROVIDER_FAILURE_THRESHOLD:
+                self.cooldown_until = now + config.PROVIDER_FAILURE_COOLDOWN
+
+    def latency_quantile(self, q):
+        """最近请求延迟的分位数（秒），样本不足时返回None"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_delay(self):
+        """发出对冲请求前的等待时间（秒）：最近延迟的分位数，限制在配置的上下限之间"""
+        delay = self.latency_quantile(config.HEDGE_QUANTILE)
+        if delay is None:
+            return config.HEDGE_MAX_DELAY_MS / 1000
+        return min(config.HEDGE_MAX_DELAY_MS, max(config.HEDGE_MIN_DELAY_MS, delay * 1000)) / 1000
+
+    def is_cooling_down(self):
+        return time.monotonic() < self.cooldown_until
+
+    def score(self):
+        """路由评分，越小越优先：实测延迟按错误率加权"""
+        latency = DEFAULT_LATENCY if self.latency is None else self.latency
+        return latency * (1 + 4 * self.error_rate)
+
+    def stats(self):
+        p90 = self.latency_quantile(0.9)
+        with self._lock:
+            return {
+                "calls": self.call_count,
+                "failures": self.failure_count,
+                "latency_ms": None if self.latency is None else self.latency * 1000,
+                "p90_ms": None if p90 is None else p90 * 1000,
+                "error_rate": self.error_rate,
+                "cooldown_seconds": max(0.0, self.cooldown_until - time.monotonic()),
+                "rate_limit": self.limiter.stats(),
+            }
+
+
+class BaiduProvider(TranslationProvider):
+    """百度翻译：多行文本用换行连接为一个q，逐行返回译文"""
+
+    name = "baidu"
+    URL = "https://api.fanyi.baidu.com/api/trans/vip/translate"
+    # 54003 访问频率受限，54005 长query请求频繁
+    THROTTLE_CODES = ("54003", "54005")
+    # 52003 未授权用户，54001 签名错误，54004 账户余额不足，58002 服务当前已关闭
+    UNAVAILABLE_CODES = ("52003", "54001", "54004", "58002")
+
+    def credentials_error(self):
+        app_id = config.BAIDU_APP_ID
+        secret_key = config.BAIDU_SECRET_KEY
+        if not app_id or not secret_key or app_id == "YOUR_APP_ID" or secret_key == "YOUR_SECRET_KEY":
+            return "请在config.py中配置百度翻译API的APP_ID和SECRET_KEY"
+        return None
+
+    def max_query_bytes(self):
+        return config.BAIDU_MAX_QUERY_BYTES
+
+    def map_language(self, code):
+        # config.LANGUAGES使用的就是百度的语言代码
+        return code
+
+    def _send(self, lines, from_lang, to_lang):
+        app_id = config.BAIDU_APP_ID
+        secret_key = config.BAIDU_SECRET_KEY
+        text = "\n".join(lines)
+
+        salt = str(random.randint(32768, 65536))
+        sign = hashlib.md5((app_id + text + salt + secret_key).encode()).hexdigest()
+
+        payload = {
+            'appid': app_id,
+            'q': text,
+            'from': from_lang,
+            'to': to_lang,
+            'salt': salt,
+            'sign': sign
+        }
+
+        try:
+            # 翻译是只读操作，超时可以重试
+            response = self.client.post(self.URL, endpoint="translate", data=payload, idempotent=True)
+            result = response.json()
+
+            if "error_code" in result:
+                error_code = str(result['error_code'])
+                return None, error_code, f"翻译出错: {error_code} - {result.get('error_msg', '未知错误')}"
+
+            if "trans_result" not in result:
+                return None, None, "翻译响应中缺少翻译结果"
+
+            return [item["dst"] for item in result["trans_result"]], None, None
+
+        except requests.exceptions.Timeout:
+            return None, None, "翻译请求超时，请稍后重试"
+        except requests.exceptions.RequestException:
+            return None, None, "网络请求错误，请检查网络连接"
+        except ValueError:
+            return None, None, "API响应格式错误"
+        except Exception:
+            return None, None, "翻译过程出错，请稍后重试"
+
+
+class YoudaoProvider(TranslationProvider):
+    """有道智云文本翻译：批量接口，每行作为一个q参数"""
+
+    name = "youdao"
+    URL = "https://openapi.youdao.com/v2/api"
+    # 411 访问频率受限，412 长请求过于频繁
+    THROTTLE_CODES = ("411", "412")
+    # 108 应用ID无效，110 无相关服务的有效实例，202 签名检验失败，401 账户已经欠费
+    UNAVAILABLE_CODES = ("108", "110", "202", "401")
+    LANGUAGE_CODES = {
+        "auto": "auto",
+        "zh": "zh-CHS",
+        "cht": "zh-CHT",
+        "en": "en",
+        "jp": "ja",
+        "kor": "ko",
+        "fra": "fr",
+        "spa": "es",
+        "ru": "ru",
+        "de": "de",
+        "it": "it",
+        "pt": "pt",
+        "vie": "vi",
+        "th": "th",
+        "ara": "ar",
+    }
+
+    def credentials_error(self):
+        app_key = config.YOUDAO_APP_KEY
+        app_secret = config.YOUDAO_APP_SECRET
+        if not app_key or not app_secret or app_key == "YOUR_APP_KEY" or app_secret == "YOUR_APP_SECRET":
+            return "请在config.py中配置有道翻译API的APP_KEY和APP_SECRET"
+        return None
+
+    def max_query_bytes(self):
+        return config.YOUDAO_MAX_QUERY_BYTES
+
+    @staticmethod
+    def _sign_input(text):
+        # 签名v3：超过20个字符时取前10个字符 + 长度 + 后10个字符
+        if len(text) <= 20:
+            return text
+        return text[:10] + str(len(text)) + text[-10:]
+
+    def _send(self, lines, from_lang, to_lang):
+        app_key = config.YOUDAO_APP_KEY
+        app_secret = config.YOUDAO_APP_SECRET
+
+        salt = uuid.uuid4().hex
+        curtime = str(int(time.time()))
+        sign_text = app_key + self._sign_input("".join(lines)) + salt + curtime + app_secret
+        sign = hashlib.sha256(sign_text.encode()).hexdigest()
+
+        payload = [("q", line) for line in lines] + [
+            ('from', from_lang),
+            ('to', to_lang),
+            ('appKey', app_key),
+            ('salt', salt),
+            ('sign', sign),
+            ('signType', 'v3'),
+            ('curtime', curtime),
+        ]
+
+        try:
+            response = self.client.post(self.URL, endpoint="translate", data=payload, idempotent=True)
+            result = response.json()
+
+            error_code = str(result.get("errorCode", ""))
+            if error_code != "0":
+                return None, error_code, f"翻译出错: {error_code} - 有道翻译接口返回错误"
+
+            if "translateResults" not in result:
+                return None, None, "翻译响应中缺少翻译结果"
+
+            return [item["translation"] for item in result["translateResults"]], None, None
+
+        except requests.exceptions.Timeout:
+            return None, None, "翻译请求超时，请稍后重试"
+        except requests.exceptions.RequestException:
+            return None, None, "网络请求错误，请检查网络连接"
+        except ValueError:
+            return None, None, "API响应格式错误"
+        except Exception:
+            return None, None, "翻译过程出错，请稍后重试"
+
+
+PROVIDER_CLASSES = {
+    "baidu": BaiduProvider,
+    "youdao": YoudaoProvider,
+}
+
+
+class ProviderRouter:
+    """在已配置的服务商之间路由翻译请求
+
+    健康的服务商按评分（实测延迟、错误率）排序，请求失败时依次换下一个；
+    暂停中的服务商只在其他服务商都不可用时才尝试。
+    少量请求会交给次优的服务商，使其延迟数据保持更新。
+    启用对冲时，交互请求超过首选服务商的延迟分位数仍未返回，就向备用服务商
+    （只有一个服务商时向同一服务商）再发一个相同的请求，先成功的结果生效，另一个被取消。
+    """
+
+    def __init__(self, providers):
+        self.providers = list(providers)
+        self._lock = threading.Lock()
+        self._executor = None
+        # 统计信息
+        self.failover_count = 0
+        self.hedgeable_count = 0
+        self.hedge_count = 0
+        self.hedge_win_count = 0
+        self.cancelled_count = 0
+
+    def configured(self):
+        return [p for p in self.providers if p.credentials_error() is None]
+
+    def credentials_error(self):
+        """没有任何服务商配置了密钥时返回提示信息"""
+        if self.configured():
+            return None
+        if not self.providers:
+            return "请在config.py的TRANSLATION_PROVIDERS中至少启用一个翻译服务商"
+        return self.providers[0].credentials_error()
+
+    def max_query_bytes(self):
+        """打包请求时使用各服务商上限中最小的一个，失败切换时无需重新打包"""
+        providers = self.configured() or self.providers
+        return min((p.max_query_bytes() for p in providers), default=config.BAIDU_MAX_QUERY_BYTES)
+
+    def candidates(self, from_lang, to_lang):
+        """返回本次请求依次尝试的服务商"""
+        providers = [p for p in self.configured()
+                     if p.map_language(from_lang) is not None and p.map_language(to_lang) is not None]
+        healthy = [p for p in providers if not p.is_cooling_down()]
+        cooling = [p for p in providers if p.is_cooling_down()]
+        order = {p: i for i, p in enumerate(self.providers)}
+        healthy.sort(key=lambda p: (p.score(), order[p]))
+        cooling.sort(key=lambda p: p.cooldown_until)
+        if len(healthy) > 1 and random.random() < config.PROVIDER_PROBE_RATE:
+            healthy[0], healthy[1] = healthy[1], healthy[0]
+        return healthy + cooling
+
+    def translate(self, lines, from_lang, to_lang, priority="interactive"):
+        """翻译多行文本，返回(每行译文的列表, 错误信息)，所有服务商都失败时返回最后一个错误"""
+        providers = self.candidates(from_lang, to_lang)
+        if not providers:
+            return None, self.credentials_error() or "翻译出错: 没有支持该语言的翻译服务"
+        tried = []
+        error = None
+        if config.HEDGE_ENABLED and priority == "interactive":
+            translated_parts, error, tried = self._hedged_request(providers, lines, from_lang, to_lang, priority)
+            if error is None:
+                return translated_parts, None
+        for provider in providers:
+            if provider in tried:
+                continue
+            if tried:
+                self.failover_count += 1
+            tried.append(provider)
+            translated_parts, _, error = provider.request(lines, from_lang, to_lang, priority)
+            if error is None:
+                return translated_parts, None
+        return None, error
+
+    def _take_hedge_budget(self):
+        """对冲请求数不超过交互请求数的HEDGE_MAX_RATIO"""
+        with self._lock:
+            if self.hedge_count + 1 > config.HEDGE_MAX_RATIO * self.hedgeable_count:
+                return False
+            self.hedge_count += 1
+            return True
+
+    def _hedged_request(self, providers, lines, from_lang, to_lang, priority):
+        """带对冲的请求，返回(每行译文的列表, 错误信息, 已尝试的服务商列表)"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=max(4, config.TRANSLATE_WORKER_THREADS * 4))
+        with self._lock:
+            self.hedgeable_count += 1
+
+        primary = providers[0]
+        cancel = threading.Event()
+        # 对冲的两个请求都在线程池中执行，耗时记入调用方的请求
+        futures = {self._executor.submit(metrics.bind(primary.request), lines, from_lang, to_lang, priority, cancel):
+                   (primary, cancel)}
+        done, _ = wait(futures, timeout=primary.hedge_delay())
+        hedge = None
+        if not done and self._take_hedge_budget():
+            secondary = providers[1] if len(providers) > 1 else primary
+            cancel = threading.Event()
+            hedge = self._executor.submit(metrics.bind(secondary.request), lines, from_lang, to_lang, priority, cancel)
+            futures[hedge] = (secondary, cancel)
+
+        tried = []
+        for provider, _ in futures.values():
+            if provider not in tried:
+                tried.append(provider)
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                translated_parts, _, future_error = future.result()
+                if future_error is None:
+                    # 先成功的结果生效，取消另一个请求
+                    for other in pending:
+                        futures[other][1].set()
+                        self.cancelled_count += 1
+                    if future is hedge:
+                        self.hedge_win_count += 1
+                    return translated_parts, None, tried
+                error = future_error
+        return None, error, tried
+
+    def call_count(self):
+        return sum(p.call_count for p in self.providers)
+
+    def warm_up(self):
+        """预热已配置服务商的连接，各自保留在自己的连接池中"""
+        for provider in self.configured():
+            provider.client.warm_up([provider.URL])
+
+    def stats(self):
+        stats = {p.name: p.stats() for p in self.providers}
+        stats["failovers"] = self.failover_count
+        stats["hedging"] = {
+            "enabled": config.HEDGE_ENABLED,
+            "eligible": self.hedgeable_count,
+            "hedged": self.hedge_count,
+            "hedge_wins": self.hedge_win_count,
+            "cancelled": self.cancelled_count,
+        }
+        return stats
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """返回进程内共享的服务商路由器，服务商按config.TRANSLATION_PROVIDERS创建"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ProviderRouter(PROVIDER_CLASSES[name]()
+                                         for name in config.TRANSLATION_PROVIDERS
+                                         if name in PROVIDER_CLASSES)
+    return _router
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+翻译请求限流
+令牌桶控制QPS，超出账号频率限制时自适应降速，并在交互请求和批量请求之间按权重分配额度；
+每个翻译服务商使用独立的限流器
+"""
+
+import time
+import random
+import threading
+from collections import deque
+
+import config
+
+class RateLimiter:
+    """共享令牌桶限流器
+
+    令牌以rate个/秒的速度生成，最多积累burst个；
+    多类调用方同时等待时，按weights加权轮流分配令牌，交互请求优先但批量请求不会被饿死；
+    服务端返回频率受限时调用penalize()把速率减半，之后每次成功逐步恢复到配置的速率。
+    """
+
+    def __init__(self, rate, burst=1, weights=None, min_rate=0.2):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.min_rate = min(min_rate, self.max_rate)
+        self.weights = dict(weights or {"interactive": 3, "bulk": 1})
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._cond = threading.Condition()
+        self._queues = {name: deque() for name in self.weights}
+        self._served = {name: 0 for name in self.weights}
+        # 统计信息
+        self.throttled_seconds = {name: 0.0 for name in self.weights}
+        self.network_seconds = 0.0
+        self.request_count = 0
+        self.requeue_count = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _next_class(self):
+        """在有等待者的类别中选出已获得份额最少（按权重）的一类"""
+        waiting = [name for name, queue in self._queues.items() if queue]
+        if not waiting:
+            return None
+        return min(waiting, key=lambda name: self._served[name] / self.weights[name])
+
+    def acquire(self, priority="interactive", cancel=None):
+        """获取一个令牌，必要时阻塞等待
+
+        cancel为可选的threading.Event，等待期间被设置时放弃排队并返回False，不消耗令牌。
+        """
+        if priority not in self._queues:
+            priority = "interactive"
+        start = time.monotonic()
+        ticket = object()
+        with self._cond:
+            queue = self._queues[priority]
+            if not queue:
+                # 空闲后重新加入的类别从当前进度开始计算份额，不能补回空闲期间的额度
+                others = [self._served[name] / self.weights[name]
+                          for name, q in self._queues.items() if q and name != priority]
+                if others:
+                    self._served[priority] = max(self._served[priority],
+                                                 min(others) * self.weights[priority])
+            queue.append(ticket)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if (self._tokens >= 1 and self._next_class() == priority
+                        and queue[0] is ticket):
+                    self._tokens -= 1
+                    queue.popleft()
+                    self._served[priority] += 1
+                    break
+                if cancel is not None and cancel.is_set():
+                    queue.remove(ticket)
+                    self._cond.notify_all()
+                    return False
+                # 等到下一个令牌生成，或被其他线程唤醒
+                wait = max(0.001, (1 - self._tokens) / self.rate) if self._tokens < 1 else 0.05
+                if cancel is not None:
+                    # 可取消的等待需要及时发现取消
+                    wait = min(wait, 0.05)
+                self._cond.wait(wait)
+            self.request_count += 1
+            self.throttled_seconds[priority] += time.monotonic() - start
+            self._cond.notify_all()
+        return True
+
+    def penalize(self):
+        """服务端报告频率受限：速率减半，并清空已积累的令牌"""
+        with self._cond:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            self._last = time.monotonic()
+
+    def report_success(self):
+        """请求成功：逐步恢复速率"""
+        if self.rate < self.max_rate:
+            with self._cond:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def backoff(self, attempt, priority="interactive", base=0.5, cap=8.0):
+        """频率受限后重新排队前的等待（带随机抖动的指数退避）"""
+        delay = random.uniform(0.5, 1.0) * min(cap, base * (2 ** attempt))
+        time.sleep(delay)
+        with self._cond:
+            self.requeue_count += 1
+            if priority in self.throttled_seconds:
+                self.throttled_seconds[priority] += delay
+
+    def record_network(self, seconds):
+        with self._cond:
+            self.network_seconds += seconds
+
+    def stats(self):
+        """返回限流统计：等待（含退避）耗时与网络耗时"""
+        with self._cond:
+            return {
+                "rate": self.rate,
+                "max_rate": self.max_rate,
+                "requests": self.request_count,
+                "requeued": self.requeue_count,
+                "throttled_seconds": dict(self.throttled_seconds),
+                "network_seconds": self.network_seconds,
+            }
+
+
+_limiters = {}
+_limiter_lock = threading.Lock()
+
+
+def get_limiter(name="baidu"):
+    """返回进程内共享的限流器，每个翻译服务商一个，速率取config中的<NAME>_QPS"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiter_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = RateLimiter(getattr(config, f"{name.upper()}_QPS", 1),
+                                      burst=config.RATE_LIMIT_BURST,
+                                      weights=config.RATE_LIMIT_WEIGHTS)
+                _limiters[name] = limiter
+    return limiter
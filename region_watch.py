@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+实时翻译（监视屏幕区域）
+按固定频率只截取选定的区域，用缩小后的灰度帧差判断内容是否真正变化，
+只有变化且画面稳定后才调用OCR，识别出的文字与上次不同时才交给翻译
+"""
+
+import sys
+
+from image_buffer import ImageBuffer
+
+
+def virtual_screen_origin():
+    """截取全部屏幕时图像左上角对应的屏幕坐标
+
+    Windows多显示器时虚拟桌面的原点可能为负（主屏左侧或上方还有显示器），其他平台为(0, 0)。
+    """
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            user32 = ctypes.windll.user32
+            # SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN
+            return user32.GetSystemMetrics(76), user32.GetSystemMetrics(77)
+        except Exception:
+            pass
+    return 0, 0
+
+
+def grab_region(bbox):
+    """只截取屏幕上的bbox(left, top, right, bottom)区域，返回ImageBuffer"""
+    from PIL import ImageGrab
+
+    try:
+        image = ImageGrab.grab(bbox=bbox, all_screens=True)
+    except TypeError:
+        # 旧版本Pillow不支持all_screens参数
+        image = ImageGrab.grab(bbox=bbox)
+    return ImageBuffer.from_pil(image)
+
+
+class FrameChangeDetector:
+    """用帧差判断截图内容是否变化
+
+    每帧取隔sample_step个像素的灰度图，与上次识别的帧相比，亮度差超过pixel_delta的像素
+    占比超过change_ratio才算内容变化；变化后还要等画面连续stable_frames帧不再变化
+    （如字幕淡入结束）才识别，一直不稳定时最多等max_unstable_frames帧。
+    """
+
+    def __init__(self, change_ratio=0.005, pixel_delta=16, stable_frames=1,
+                 max_unstable_frames=4, sample_step=2):
+        self.change_ratio = change_ratio
+        self.pixel_delta = pixel_delta
+        self.stable_frames = stable_frames
+        self.max_unstable_frames = max_unstable_frames
+        self.sample_step = sample_step
+        # 上次识别的帧和上一帧
+        self._reference = None
+        self._previous = None
+        self._stable = 0
+        self._waited = 0
+
+    def _sample(self, frame):
+        import numpy as np
+        return frame.gray()[::self.sample_step, ::self.sample_step].astype(np.int16)
+
+    def _changed(self, a, b):
+        import numpy as np
+        if a.shape != b.shape:
+            return True
+        return np.count_nonzero(np.abs(a - b) > self.pixel_delta) > a.size * self.change_ratio
+
+    def update(self, frame):
+        """送入一帧，返回是否应该识别这一帧"""
+        sample = self._sample(frame)
+        previous, self._previous = self._previous, sample
+
+        if self._reference is not None and not self._changed(sample, self._reference):
+            # 与上次识别的内容相同
+            self._stable = 0
+            self._waited = 0
+            return False
+
+        if previous is None or not self._changed(sample, previous):
+            self._stable += 1
+        else:
+            self._stable = 0
+        self._waited += 1
+        if (self._reference is None or self._stable >= self.stable_frames
+                or self._waited > self.max_unstable_frames):
+            self._reference = sample
+            self._stable = 0
+            self._waited = 0
+            return True
+        return False
+
+    def reset(self):
+        self._reference = None
+        self._previous = None
+        self._stable = 0
+        self._waited = 0
+
+
+class RegionWatcher:
+    """监视一个屏幕区域，内容变化时识别文字
+
+    recognize(frame)返回识别出的文本；每次poll()截取一帧，
+    返回需要更新翻译的新文本，内容没有变化或文字与上次相同时返回None。
+    is_cancelled在截图之后、识别之前检查，已停止时不再发起识别。
+    """
+
+    def __init__(self, bbox, recognize, detector=None, grab=grab_region):
+        self.bbox = bbox
+        self.recognize = recognize
+        self.detector = detector or FrameChangeDetector()
+        self.grab = grab
+        self.last_text = None
+        # 统计信息
+        self.frames_captured = 0
+        self.frames_skipped = 0
+        self.ocr_calls = 0
+        self.texts_emitted = 0
+
+    def poll(self, is_cancelled=None):
+        frame = self.grab(self.bbox)
+        self.frames_captured += 1
+        if not self.detector.update(frame):
+            self.frames_skipped += 1
+            return None
+        if is_cancelled is not None and is_cancelled():
+            return None
+
+        self.ocr_calls += 1
+        text = self.recognize(frame).strip()
+        # 区域内暂时没有文字（如两句字幕之间）时保留上次的结果
+        if not text or text == self.last_text:
+            return None
+        self.last_text = text
+        self.texts_emitted += 1
+        return text
+
+    def stats(self):
+        """返回统计信息，节省的API调用相对于每帧都识别并翻译计算"""
+        return {
+            "frames_captured": self.frames_captured,
+            "frames_skipped": self.frames_skipped,
+            "ocr_calls": self.ocr_calls,
+            "translations": self.texts_emitted,
+            "api_calls_saved": 2 * self.frames_captured - self.ocr_calls - self.texts_emitted,
+        }
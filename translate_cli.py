@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+命令行批量翻译
+不需要图形界面，逐行流式读取纯文本或JSONL文件，
+经过批量打包、缓存和限流后并发翻译，按原顺序边翻译边写出结果
+
+用法示例:
+    python translate_cli.py input.txt -o output.txt --to en
+    python translate_cli.py data.jsonl --format jsonl --field text --to zh
+"""
+
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from cache import LRUCache, DiskCache, TieredCache
+from providers import get_router
+from translator_api import TranslatorAPI
+
+
+def resolve_language(name):
+    """语言名称（如"英语"）或语言代码均可"""
+    return config.LANGUAGES.get(name, name)
+
+
+def open_cache(use_disk):
+    """创建与图形界面相同配置的两级缓存"""
+    memory = LRUCache(config.MEMORY_CACHE_MAX_KB * 1024)
+    disk = None
+    if use_disk and config.DISK_CACHE_ENABLED:
+        try:
+            disk = DiskCache(config.DISK_CACHE_PATH,
+                             ttl=config.DISK_CACHE_TTL_DAYS * 86400,
+                             max_bytes=config.DISK_CACHE_MAX_MB * 1024 * 1024)
+        except Exception as e:
+            print(f"打开磁盘缓存出错: {str(e)}", file=sys.stderr)
+    return TieredCache(memory, disk)
+
+
+def read_records(stream, fmt, field):
+    """逐行读取输入，生成(记录, 待翻译文本)"""
+    for line in stream:
+        line = line.rstrip("\r\n")
+        if fmt == "text":
+            yield line, line
+            continue
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        value = record.get(field) if isinstance(record, dict) else None
+        yield record, value if isinstance(value, str) else None
+
+
+def read_batches(records, max_lines, max_bytes):
+    """把记录分批，每批的文本总量不超过一次请求的上限（单条过长时单独成批）"""
+    batch, batch_bytes = [], 0
+    for record, text in records:
+        size = len(text.encode("utf-8")) + 1 if text else 0
+        if batch and (len(batch) >= max_lines or batch_bytes + size > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append((record, text))
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+class BatchRunner:
+    """有界并发的批量翻译，按输入顺序写出结果"""
+
+    def __init__(self, args, cache):
+        self.args = args
+        self.cache = cache
+        self.from_lang = resolve_language(args.from_lang)
+        self.to_lang = resolve_language(args.to_lang)
+        self.output_field = args.output_field or f"{args.field}_translated"
+        # 统计信息
+        self.records = 0
+        self.chars = 0
+        self.errors = 0
+        self.cached = 0
+        self.start_time = time.perf_counter()
+        self._last_report = self.start_time
+
+    def translate_batch(self, batch):
+        texts = [text for _, text in batch if text]
+        results = iter(TranslatorAPI.translate_many(texts, self.from_lang, self.to_lang,
+                                                    cache=self.cache, priority="bulk"))
+        return [(record, text, next(results) if text else None) for record, text in batch]
+
+    def write_batch(self, output, translated):
+        for record, text, result in translated:
+            self.records += 1
+            if result is None:
+                # 空行或JSONL中没有待翻译字段，原样输出
+                output.write((text or "") + "\n" if self.args.format == "text"
+                             else json.dumps(record, ensure_ascii=False) + "\n")
+                continue
+            self.chars += len(text)
+            self.cached += result.cached
+            if result.error:
+                self.errors += 1
+                print(f"第{self.records}行翻译失败: {result.error}", file=sys.stderr)
+            if self.args.format == "text":
+                output.write((result.text or "") + "\n")
+            else:
+                if result.error:
+                    record["translate_error"] = result.error
+                else:
+                    record[self.output_field] = result.text
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        self.report()
+
+    def run(self, source, output):
+        records = read_records(source, self.args.format, self.args.field)
+        batches = read_batches(records, self.args.batch_lines, config.BAIDU_MAX_QUERY_BYTES)
+        # 在途的批次数有上限，读取速度不会超过翻译速度太多，内存占用有界
+        window = deque()
+        with ThreadPoolExecutor(max_workers=self.args.workers) as executor:
+            for batch in batches:
+                window.append(executor.submit(self.translate_batch, batch))
+                if len(window) >= self.args.workers * 2:
+                    self.write_batch(output, window.popleft().result())
+            while window:
+                self.write_batch(output, window.popleft().result())
+        self.report(final=True)
+
+    def report(self, final=False):
+        """输出吞吐量统计到标准错误"""
+        now = time.perf_counter()
+        if not final and now - self._last_report < self.args.report_interval:
+            return
+        self._last_report = now
+        elapsed = max(now - self.start_time, 1e-9)
+        limiters = [provider.limiter.stats() for provider in get_router().providers]
+        throttled = sum(sum(limiter["throttled_seconds"].values()) for limiter in limiters)
+        network = sum(limiter["network_seconds"] for limiter in limiters)
+        print(f"{'完成' if final else '进度'}: {self.records}行 {self.chars}字符 "
+              f"用时{elapsed:.1f}s | {self.records / elapsed:.1f}行/s {self.chars / elapsed:.0f}字符/s | "
+              f"API调用{TranslatorAPI.api_call_count()}次 缓存命中{self.cached}条 失败{self.errors}条 | "
+              f"限流等待{throttled:.1f}s 网络{network:.1f}s",
+              file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="命令行批量翻译（无需图形界面）")
+    parser.add_argument("input", help="输入文件，'-'表示标准输入")
+    parser.add_argument("-o", "--output", default="-", help="输出文件，默认标准输出")
+    parser.add_argument("--format", choices=("text", "jsonl"), default="text",
+                        help="输入格式：纯文本逐行翻译，或JSONL翻译指定字段")
+    parser.add_argument("--field", default="text", help="JSONL中待翻译的字段")
+    parser.add_argument("--output-field", default=None,
+                        help="JSONL中写入译文的字段，默认为<field>_translated")
+    parser.add_argument("--from", dest="from_lang", default="auto", help="源语言代码或名称")
+    parser.add_argument("--to", dest="to_lang", default="zh", help="目标语言代码或名称")
+    parser.add_argument("--workers", type=int, default=config.DOCUMENT_WORKERS, help="并发请求数")
+    parser.add_argument("--batch-lines", type=int, default=200, help="每批最多行数")
+    parser.add_argument("--no-disk-cache", action="store_true", help="不使用磁盘缓存")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="进度输出间隔（秒）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    args.workers = max(1, args.workers)
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        runner = BatchRunner(args, open_cache(not args.no_disk_cache))
+        runner.run(source, output)
+    except json.JSONDecodeError as e:
+        print(f"JSONL格式错误: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 1 if runner.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地翻译服务
+基于asyncio的HTTP服务，多个图形界面或脚本共用一份缓存、一个连接池和一份API额度，
+相同的请求在处理中时会合并为一次上游调用
+
+接口（请求和响应均为JSON）:
+    POST /translate        {"text": "...", "from": "auto", "to": "zh"}
+    POST /translate_many   {"segments": ["...", ...], "from": "auto", "to": "zh"}
+    POST /ocr              {"image": "<base64编码的PNG或JPEG>", "encoded": false}
+                           encoded为true表示客户端已做过预处理，服务原样上传，不再重新编码
+    GET  /stats
+    GET  /metrics          各阶段耗时的分位数（Prometheus文本格式）
+
+用法:
+    python translate_service.py --host 127.0.0.1 --port 8765
+然后在客户端的config.py中设置 TRANSLATION_SERVICE_URL = "http://127.0.0.1:8765"
+"""
+
+import io
+import sys
+import json
+import time
+import base64
+import hashlib
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from cache import LRUCache, DiskCache, TieredCache, make_cache_key
+from metrics import get_metrics, activate
+from providers import get_router
+from translator_api import TranslatorAPI
+
+# 请求体大小上限
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class TranslationService:
+    """翻译服务
+
+    阻塞的上游调用在线程池中执行；相同的请求正在处理时，后来者等待同一个结果。
+    """
+
+    def __init__(self, workers=8, token=""):
+        memory = LRUCache(config.MEMORY_CACHE_MAX_KB * 1024)
+        disk = None
+        if config.DISK_CACHE_ENABLED:
+            try:
+                disk = DiskCache(config.DISK_CACHE_PATH,
+                                 ttl=config.DISK_CACHE_TTL_DAYS * 86400,
+                                 max_bytes=config.DISK_CACHE_MAX_MB * 1024 * 1024)
+            except Exception as e:
+                print(f"打开磁盘缓存出错: {str(e)}", file=sys.stderr)
+        self.cache = TieredCache(memory, disk)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.token = token
+        self._ocr_engine = None
+        self._inflight = {}
+        # 统计信息
+        self.start_time = time.time()
+        self.request_count = 0
+        self.coalesced_count = 0
+
+    def ocr_engine(self):
+        if self._ocr_engine is None:
+            # OCR依赖PIL和NumPy，只在第一次使用时加载
+            from ocr import OCREngine
+            self._ocr_engine = OCREngine.from_config()
+        return self._ocr_engine
+
+    async def coalesce(self, key, func, *args):
+        """合并相同的在途请求：同一个key只在线程池中执行一次"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced_count += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, func, *args)
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _translate(self, text, from_lang, to_lang):
+        trace = get_metrics().start_trace("service_translate")
+        with activate(trace):
+            result = TranslatorAPI.translate_many([text], from_lang, to_lang, cache=self.cache)[0]
+        trace.finish("error" if result.error else "ok")
+        return {"text": result.text, "error": result.error, "cached": result.cached}
+
+    def _translate_many(self, segments, from_lang, to_lang, priority):
+        trace = get_metrics().start_trace("service_translate_many")
+        with activate(trace):
+            results = TranslatorAPI.translate_many(segments, from_lang, to_lang,
+                                                   cache=self.cache, priority=priority)
+        trace.finish("error" if any(r.error for r in results) else "ok")
+        return {"results": [{"text": r.text, "error": r.error, "cached": r.cached} for r in results]}
+
+    def _ocr(self, image_bytes, encoded=False):
+        from PIL import Image
+        trace = get_metrics().start_trace("service_ocr")
+        with activate(trace):
+            with trace.span("decode"):
+                image = Image.open(io.BytesIO(image_bytes))
+                image.load()
+            # 解码后的图像用于结果缓存；已预处理的数据直接上传，避免重复压缩
+            text, info = self.ocr_engine().recognize(image, image_bytes if encoded else None)
+        if text.startswith(("OCR", "请在config.py中配置", "图像为空")):
+            trace.finish("error")
+            return {"text": None, "error": text}
+        trace.finish("ok")
+        return {"text": text, "error": None, "info": info}
+
+    async def dispatch(self, method, path, body, headers):
+        """按路径分发请求，返回响应的JSON对象"""
+        if self.token and headers.get("x-service-token") != self.token:
+            raise HTTPError(401, "服务令牌无效")
+
+        if path == "/stats":
+            return self.stats()
+        if path == "/metrics":
+            return get_metrics().render()
+        if method != "POST":
+            raise HTTPError(405, "只支持POST请求")
+
+        try:
+            payload = json.loads(body.decode("utf-8") or "{}")
+        except (UnicodeDecodeError, ValueError):
+            raise HTTPError(400, "请求体不是有效的JSON")
+        from_lang = payload.get("from", "auto")
+        to_lang = payload.get("to", "zh")
+
+        if path == "/translate":
+            text = payload.get("text")
+            if not isinstance(text, str):
+                raise HTTPError(400, "缺少text字段")
+            key = ("translate", make_cache_key(text, from_lang, to_lang))
+            return await self.coalesce(key, self._translate, text, from_lang, to_lang)
+
+        if path == "/translate_many":
+            segments = payload.get("segments")
+            if not isinstance(segments, list) or not all(isinstance(s, str) for s in segments):
+                raise HTTPError(400, "segments必须是字符串列表")
+            priority = payload.get("priority", "interactive")
+            digest = hashlib.sha1(json.dumps(segments, ensure_ascii=False).encode("utf-8")).hexdigest()
+            key = ("translate_many", digest, from_lang, to_lang)
+            return await self.coalesce(key, self._translate_many, segments, from_lang, to_lang, priority)
+
+        if path == "/ocr":
+            try:
+                image_bytes = base64.b64decode(payload.get("image", ""), validate=True)
+            except ValueError:
+                raise HTTPError(400, "image必须是base64编码的图像")
+            if not image_bytes:
+                raise HTTPError(400, "缺少image字段")
+            encoded = bool(payload.get("encoded", False))
+            key = ("ocr", hashlib.sha1(image_bytes).hexdigest(), encoded)
+            return await self.coalesce(key, self._ocr, image_bytes, encoded)
+
+        raise HTTPError(404, f"未知接口: {path}")
+
+    def stats(self):
+        stats = {
+            "uptime": time.time() - self.start_time,
+            "requests": self.request_count,
+            "coalesced": self.coalesced_count,
+            "inflight": len(self._inflight),
+            "api_calls": TranslatorAPI.api_call_count(),
+            "cache": self.cache.stats(),
+            "providers": get_router().stats(),
+        }
+        if self._ocr_engine is not None:
+            stats["ocr_cache"] = self._ocr_engine.result_cache.stats()
+        return stats
+
+    async def handle_connection(self, reader, writer):
+        """处理一个连接上的请求，支持HTTP/1.1长连接"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                self.request_count += 1
+                status = 200
+                try:
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY_BYTES:
+                        raise HTTPError(413, "请求体过大")
+                    body = await reader.readexactly(length) if length else b""
+                    response = await self.dispatch(method.upper(), target.split("?", 1)[0],
+                                                   body, headers)
+                except HTTPError as e:
+                    status, response = e.status, {"error": e.message}
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    status, response = 500, {"error": f"服务内部错误: {str(e)}"}
+
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close"
+                              and status != 413)
+                if isinstance(response, str):
+                    data = response.encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                else:
+                    data = json.dumps(response, ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                writer.write((f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                              f"Content-Type: {content_type}\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                              f"\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"翻译服务已启动: http://{host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="本地翻译服务（共享缓存、连接池和API额度）")
+    parser.add_argument("--host", default=config.SERVICE_HOST, help="监听地址")
+    parser.add_argument("--port", type=int, default=config.SERVICE_PORT, help="监听端口")
+    parser.add_argument("--workers", type=int, default=8, help="上游请求线程数")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    # 服务本身直接调用翻译接口，不能再转发给服务
+    config.TRANSLATION_SERVICE_URL = ""
+    # 服务的统计通过/metrics抓取，不写入与图形界面共用的统计文件
+    config.METRICS_PATH = ""
+    service = TranslationService(workers=args.workers, token=config.SERVICE_TOKEN)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+翻译记忆
+保存翻译过的原文和译文，按字符n-gram的Jaccard相似度查找与新原文相近的条目，
+在准确译文返回之前先给出相近条目的译文。条目保存在SQLite文件中，启动后在后台载入。
+
+索引使用前缀过滤：n-gram按固定的全局顺序（少见的在前）排列，每个条目只索引排在最前的
+|S| - ceil(t * |S|) + 1个，查找时同样只查原文的前缀。相似度不低于阈值t的两段文本的前缀
+必然有共同的n-gram，所以结果与逐条比较相同；候选条目先按n-gram数量过滤，再精确计算相似度，
+十万条以上时单次查找仍在1毫秒以内。
+"""
+
+import os
+import sys
+import math
+import time
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+
+from cache import normalize_text
+
+# 索引中没有的n-gram的编号，排在最前面
+UNSEEN = sys.maxsize
+
+
+def _is_cjk(ch):
+    # 假名、中日韩统一表意文字和谚文
+    return "\u3040" <= ch <= "\u9fff" or "\uac00" <= ch <= "\ud7af"
+
+
+def ngrams(text):
+    """文本的字符n-gram集合：含中日韩文字时用2-gram，否则用4-gram"""
+    text = normalize_text(text).casefold()
+    n = 2 if any(_is_cjk(ch) for ch in text) else 4
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class TranslationMemory:
+    """按n-gram相似度查找的翻译记忆
+
+    n-gram编号即全局顺序，编号越大越靠前。新出现的n-gram编号最大，通常也较少见；
+    批量载入时按出现次数从多到少分配编号，使前缀尽量由少见的n-gram组成。
+    每个语言对一个倒排索引（n-gram编号 -> 条目编号数组），各条目的n-gram编号依次存放在
+    一个连续数组中，候选条目的过滤和相似度计算用NumPy批量完成。
+    条目数超过max_segments时淘汰最久没有更新的条目，被淘汰的编号在索引中留到下次重建时才清除。线程安全。
+    """
+
+    # 失效编号超过该数量且多于有效条目时重建索引
+    REBUILD_MIN_DEAD = 1000
+
+    def __init__(self, threshold=0.8, max_segments=200000, min_chars=6, max_chars=1000, path=None):
+        self.threshold = threshold
+        self.max_segments = max_segments
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.path = path
+        # 条目编号 -> (原文, 译文, 语言对)，被淘汰的为None
+        self._segments = []
+        # 各条目的n-gram编号（升序）依次存放在_grams中，_offsets和_sizes为起始位置和数量；
+        # 被淘汰条目的数量记为0，查找时自然被按数量过滤掉
+        self._grams = array("i")
+        self._offsets = array("i")
+        self._sizes = array("i")
+        # (语言对, 规范化原文) -> 条目编号，按最近更新排序
+        self._keys = OrderedDict()
+        self._gram_ids = {}
+        # 语言对 -> {n-gram编号: 条目编号数组}
+        self._indexes = {}
+        self._dead = 0
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        # 统计信息
+        self.lookups = 0
+        self.matches = 0
+        self.lookup_seconds = 0.0
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._connect().execute("""
+                    CREATE TABLE IF NOT EXISTS segments (
+                        from_lang TEXT NOT NULL,
+                        to_lang TEXT NOT NULL,
+                        source TEXT NOT NULL,
+                        translation TEXT NOT NULL,
+                        updated REAL NOT NULL,
+                        PRIMARY KEY (from_lang, to_lang, source)
+                    )
+                """)
+            except (OSError, sqlite3.Error):
+                self.path = None
+
+    def _connect(self):
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _accepts(self, source):
+        return self.min_chars <= len(source) <= self.max_chars
+
+    def _prefix_length(self, size):
+        """相似度达到阈值的文本至少共有ceil(t * size)个n-gram，前缀取size - 该值 + 1个"""
+        return size - max(1, math.ceil(self.threshold * size - 1e-9)) + 1
+
+    def add(self, text, from_lang, to_lang, translation, persist=True, replace=True):
+        """保存一条翻译；replace为False时不覆盖已有的条目（从文件载入时使用）"""
+        source = normalize_text(text)
+        if not self._accepts(source) or not translation:
+            return
+        pair = (from_lang, to_lang)
+        key = (pair, source)
+        with self._lock:
+            seg_id = self._keys.get(key)
+            if seg_id is not None:
+                if not replace:
+                    return
+                self._segments[seg_id] = (source, translation, pair)
+                self._keys.move_to_end(key)
+            else:
+                gram_ids = self._gram_ids
+                grams = sorted(gram_ids.setdefault(gram, len(gram_ids)) for gram in ngrams(source))
+                self._insert(key, source, translation, pair, grams)
+                while len(self._keys) > self.max_segments:
+                    _, old_id = self._keys.popitem(last=False)
+                    self._segments[old_id] = None
+                    self._sizes[old_id] = 0
+                    self._dead += 1
+                if self._dead > self.REBUILD_MIN_DEAD and self._dead > len(self._keys):
+                    self._rebuild()
+
+        if persist and self.path:
+            try:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO segments (from_lang, to_lang, source, translation, updated) "
+                    "VALUES (?, ?, ?, ?, ?)", (from_lang, to_lang, source, translation, time.time()))
+            except sqlite3.Error:
+                pass
+
+    def _insert(self, key, source, translation, pair, grams):
+        """把条目加入索引，grams为升序的n-gram编号，调用方需持有锁"""
+        seg_id = len(self._segments)
+        self._segments.append((source, translation, pair))
+        self._offsets.append(len(self._grams))
+        self._sizes.append(len(grams))
+        self._grams.extend(grams)
+        self._keys[key] = seg_id
+        index = self._indexes.setdefault(pair, {})
+        # 前缀为编号最大的几个
+        for gram in grams[len(grams) - self._prefix_length(len(grams)):]:
+            postings = index.get(gram)
+            if postings is None:
+                postings = index[gram] = array("i")
+            postings.append(seg_id)
+
+    def _rebuild(self):
+        """丢弃被淘汰的条目，重新编号并建立索引，调用方需持有锁"""
+        live = [(self._segments[seg_id], self._grams[self._offsets[seg_id]:
+                                                     self._offsets[seg_id] + self._sizes[seg_id]])
+                for seg_id in self._keys.values()]
+        self._segments = []
+        self._grams = array("i")
+        self._offsets = array("i")
+        self._sizes = array("i")
+        self._keys = OrderedDict()
+        self._indexes = {}
+        self._dead = 0
+        for (source, translation, pair), grams in live:
+            self._insert((pair, source), source, translation, pair, grams.tolist())
+
+    def lookup(self, text, from_lang, to_lang):
+        """查找最相近的条目，返回(相似度, 译文, 条目的原文)，没有达到阈值的条目时返回None"""
+        start = time.perf_counter()
+        source = normalize_text(text)
+        if not self._accepts(source):
+            return None
+        grams = ngrams(source)
+        with self._lock:
+            self.lookups += 1
+            best = None
+            index = self._indexes.get((from_lang, to_lang))
+            if index:
+                query = sorted((self._gram_ids.get(gram, UNSEEN) for gram in grams), reverse=True)
+                postings = [index[gram] for gram in query[:self._prefix_length(len(query))] if gram in index]
+                if postings:
+                    seg_id, score = self._best_candidate(query, postings)
+                    if seg_id is not None:
+                        source, translation, _ = self._segments[seg_id]
+                        best = (score, translation, source)
+            if best is not None:
+                self.matches += 1
+            self.lookup_seconds += time.perf_counter() - start
+        return best
+
+    def _best_candidate(self, query, postings):
+        """在前缀命中的条目中找相似度最高的一个，返回(条目编号, 相似度)，调用方需持有锁
+
+        NumPy数组直接引用array的内存，函数返回时即释放，之后array才能继续追加。
+        """
+        import numpy as np
+
+        size = len(query)
+        known = np.array(sorted(gram for gram in query if gram != UNSEEN), dtype=np.intc)
+        candidates = np.unique(np.concatenate([np.frombuffer(ids, dtype=np.intc) for ids in postings]))
+        # 相似度达到阈值时两者的n-gram数量之比在[t, 1/t]之内（被淘汰的条目数量为0）
+        sizes = np.frombuffer(self._sizes, dtype=np.intc)[candidates]
+        keep = (sizes >= self.threshold * size) & (sizes <= size / self.threshold)
+        candidates, sizes = candidates[keep], sizes[keep]
+        if not len(candidates) or not len(known):
+            return None, None
+
+        # 取出各候选条目的全部n-gram，统计与原文共有的数量
+        starts = np.frombuffer(self._offsets, dtype=np.intc)[candidates]
+        ends = np.cumsum(sizes)
+        positions = np.arange(ends[-1]) + np.repeat(starts - (ends - sizes), sizes)
+        grams = np.frombuffer(self._grams, dtype=np.intc)[positions]
+        found = np.searchsorted(known, grams)
+        hits = known[np.minimum(found, len(known) - 1)] == grams
+        shared = np.add.reduceat(hits.astype(np.intc), ends - sizes)
+        scores = shared / (size + sizes - shared)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None, None
+        return int(candidates[best]), float(scores[best])
+
+    def load(self):
+        """从文件载入最近更新的max_segments条，并删除更早的条目"""
+        if not self.path:
+            return 0
+        try:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT from_lang, to_lang, source, translation FROM segments "
+                "ORDER BY updated DESC LIMIT ?", (self.max_segments,)).fetchall()
+            if len(rows) == self.max_segments:
+                conn.execute("DELETE FROM segments WHERE rowid NOT IN "
+                             "(SELECT rowid FROM segments ORDER BY updated DESC LIMIT ?)",
+                             (self.max_segments,))
+        except sqlite3.Error:
+            return 0
+        # 从旧到新加入，淘汰顺序与更新时间一致
+        self.extend(reversed(rows))
+        return len(rows)
+
+    def extend(self, rows):
+        """批量加入(源语言, 目标语言, 原文, 译文)，不写入文件，也不覆盖已有的条目
+
+        先统计各n-gram的出现次数，按从多到少为新n-gram分配编号，常见的n-gram排在前缀之外。
+        """
+        rows = [(from_lang, to_lang, normalize_text(source), translation)
+                for from_lang, to_lang, source, translation in rows]
+        counts = {}
+        for _, _, source, _ in rows:
+            for gram in ngrams(source):
+                counts[gram] = counts.get(gram, 0) + 1
+        with self._lock:
+            for gram in sorted(counts, key=counts.get, reverse=True):
+                self._gram_ids.setdefault(gram, len(self._gram_ids))
+        for from_lang, to_lang, source, translation in rows:
+            self.add(source, from_lang, to_lang, translation, persist=False, replace=False)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def stats(self):
+        """返回条目数、查找次数、命中次数和平均查找耗时"""
+        with self._lock:
+            return {
+                "segments": len(self._keys),
+                "lookups": self.lookups,
+                "matches": self.matches,
+                "avg_lookup_ms": self.lookup_seconds / self.lookups * 1000 if self.lookups else 0.0,
+            }
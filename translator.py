@@ -16,13 +16,10 @@ warnings.filterwarnings("ignore")
 os.environ['PYTHONWARNINGS'] = 'ignore'
 
 # 现在导入其他模块
+# NumPy、PIL、keyboard和requests只在首次使用时导入，以加快启动速度
 import time
-import hashlib
-import random
-import requests
 import base64
-from datetime import datetime
-import keyboard
+import threading
 import warnings
 
 # 忝略其他警告
@@ -31,27 +28,60 @@ os.environ['PYTHONWARNINGS'] = 'ignore'
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QPushButton, QTextEdit, QComboBox,
                             QLabel, QMessageBox, QSplitter, QShortcut, QStatusBar)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QPoint, QUrl, QTimer
-from PyQt5.QtGui import QPixmap, QKeySequence, QFont, QDesktopServices, QClipboard, QImage, QIcon
-import numpy as np
-from PIL import Image, ImageGrab
+from PyQt5.QtCore import (Qt, QThread, pyqtSignal, QPoint, QUrl, QTimer,
+                          QObject, QRunnable, QThreadPool, QEvent)
+from PyQt5.QtGui import QPixmap, QKeySequence, QFont, QDesktopServices, QClipboard, QIcon
 
 # 导入配置
 import config
+from cache import LRUCache, DiskCache, TieredCache, make_cache_key
+from document import DocumentTranslator, diff_range
+from metrics import get_metrics, activate, span
+from image_buffer import ImageBuffer
+
+
+def find_icon_path():
+    """查找应用图标文件，结果只计算一次"""
+    global _icon_path
+    if _icon_path is None:
+        # 尝试多种可能的图标路径
+        icon_paths = [
+            "ico.ico",  # 当前目录
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "ico.ico"),  # 脚本所在目录
+            os.path.join(os.path.dirname(sys.executable), "ico.ico"),  # 可执行文件所在目录
+            os.path.join(sys._MEIPASS, "ico.ico") if hasattr(sys, "_MEIPASS") else None  # PyInstaller打包时的临时目录
+        ]
+        _icon_path = next((path for path in icon_paths if path and os.path.exists(path)), "")
+    return _icon_path
+
+
+_icon_path = None
+
 
 class ScreenshotThread(QThread):
     """截图线程，避免截图时界面卡顿"""
     screenshot_taken = pyqtSignal(object)
 
+    def __init__(self, trace=None, parent=None):
+        super().__init__(parent)
+        self.trace = trace
+
     def run(self):
         try:
-            # 延迟一小段时间，让用户有时间切换到目标窗口
-            time.sleep(0.5)
-            # 截取全屏
-            screenshot = ImageGrab.grab()
-            # 转换为numpy数组，方便后续处理
-            screenshot_np = np.array(screenshot)
-            self.screenshot_taken.emit(screenshot_np)
+            from PIL import ImageGrab
+
+            with activate(self.trace), span("grab"):
+                # 截取全部屏幕（多显示器时为整个虚拟桌面）
+                try:
+                    screenshot = ImageGrab.grab(all_screens=True)
+                except TypeError:
+                    # 旧版本Pillow不支持all_screens参数
+                    screenshot = ImageGrab.grab()
+                # 转换为一块连续内存，这是之后唯一的一份全屏数据，
+                # 选择窗口、剪贴板和OCR都在其上取视图，不再复制
+                buffer = ImageBuffer.from_pil(screenshot)
+                del screenshot
+            self.screenshot_taken.emit(buffer)
         except Exception as e:
             self.screenshot_taken.emit(None)
 
@@ -61,16 +91,18 @@ class OCRThread(QThread):
     """进行OCR识别的线程"""
     ocr_completed = pyqtSignal(str)
 
-    def __init__(self, image, parent=None):
+    def __init__(self, image, parent=None, trace=None):
         super().__init__(parent)
         self.image = image
         self.parent = parent
+        self.trace = trace
 
     def run(self):
         try:
             # 调用OCR识别
             if hasattr(self.parent, 'ocr_with_baidu_api'):
-                text = self.parent.ocr_with_baidu_api(self.image)
+                with activate(self.trace), span("ocr"):
+                    text = self.parent.ocr_with_baidu_api(self.image)
                 self.ocr_completed.emit(text)
             else:
                 self.ocr_completed.emit("无法调用OCR识别方法")
@@ -79,65 +111,147 @@ class OCRThread(QThread):
             error_msg = f"OCR识别出错: {str(e)}"
             self.ocr_completed.emit(error_msg)
 
+
+class WatchThread(QThread):
+    """实时翻译线程：按固定频率截取选定区域，内容变化时才识别"""
+    text_changed = pyqtSignal(str)
+    stats_updated = pyqtSignal(dict)
+
+    def __init__(self, watcher, interval_ms, parent=None):
+        super().__init__(parent)
+        self.watcher = watcher
+        self.interval = interval_ms / 1000
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            try:
+                text = self.watcher.poll(self._stop_event.is_set)
+            except Exception as e:
+                text = f"实时翻译出错: {str(e)}"
+            if self._stop_event.is_set():
+                break
+            if text is not None:
+                self.text_changed.emit(text)
+            self.stats_updated.emit(self.watcher.stats())
+            # 截图和识别的耗时计入间隔，保持固定的截图频率
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+
+# 选择区域边框及抗锯齿可能超出选区的像素数，重绘时一并更新
+SELECTION_BORDER = 2
+
+
 class ScreenshotWidget(QWidget):
     """截图选择区域窗口"""
     screenshot_completed = pyqtSignal(object)
 
-    def __init__(self, screenshot_np):
+    def __init__(self, buffer, trace=None):
         super().__init__()
-        self.screenshot_np = screenshot_np
+        self.buffer = buffer
+        self.trace = trace
         self.begin = QPoint()
         self.end = QPoint()
+        self.setAttribute(Qt.WA_DeleteOnClose)
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
         self.showFullScreen()
         self.setStyleSheet("background-color:black; opacity: 0.5;")
         self.setCursor(Qt.CrossCursor)
 
-        # 将numpy数组转换为QImage
-        height, width, channel = screenshot_np.shape
-        bytes_per_line = 3 * width
-        # 注意：OpenCV使用BGR格式，而Qt使用RGB格式，这里需要转换
-        if channel == 3:  # RGB
-            qimg = QImage(screenshot_np.data, width, height, bytes_per_line, QImage.Format_RGB888)
-        else:  # RGBA
-            qimg = QImage(screenshot_np.data, width, height, screenshot_np.strides[0], QImage.Format_RGBA8888)
+        # QImage直接引用缓冲区的内存，不复制；绘制时直接使用QImage，不再转换为QPixmap
+        self.qimage = buffer.qimage()
+        self._dimmed = None
 
-        # 将QImage转换为QPixmap
-        self.pixmap = QPixmap.fromImage(qimg)
+    def release_frame(self):
+        """释放对全屏截图的引用（选区视图仍在使用时，内存在识别结束后回收）"""
+        self.qimage = None
+        self.buffer = None
+        self._dimmed = None
 
-    def paintEvent(self, event=None):
-        from PyQt5.QtGui import QPainter, QColor
+    def selection_rect(self):
+        """当前选择区域（窗口坐标，已规范化），尚未开始选择时返回None"""
         from PyQt5.QtCore import QRect
 
+        if self.begin.isNull() and self.end.isNull():
+            return None
+        return QRect(self.begin, self.end).normalized()
+
+    def dirty_rect(self, selection):
+        """选择区域及其边框占用的范围"""
+        return selection.adjusted(-SELECTION_BORDER, -SELECTION_BORDER, SELECTION_BORDER, SELECTION_BORDER)
+
+    def dimmed_background(self):
+        """调暗后的整屏背景，按窗口大小绘制一次后缓存"""
+        from PyQt5.QtGui import QPainter, QColor
+
+        ratio = self.devicePixelRatioF()
+        if self._dimmed is None or self._dimmed.size() != self.size() * ratio:
+            self._dimmed = QPixmap(self.size() * ratio)
+            self._dimmed.setDevicePixelRatio(ratio)
+            painter = QPainter(self._dimmed)
+            painter.drawImage(self.rect(), self.qimage)
+            painter.fillRect(self.rect(), QColor(0, 0, 0, 128))
+            painter.end()
+        return self._dimmed
+
+    def draw_frame(self, painter, rect):
+        """绘制截图中与窗口区域rect对应的部分"""
+        from PyQt5.QtCore import QRectF
+
+        scale_x = self.qimage.width() / max(1, self.width())
+        scale_y = self.qimage.height() / max(1, self.height())
+        source = QRectF(rect.x() * scale_x, rect.y() * scale_y, rect.width() * scale_x, rect.height() * scale_y)
+        painter.drawImage(QRectF(rect), self.qimage, source)
+
+    def paintEvent(self, event):
+        from PyQt5.QtCore import QRectF
+        from PyQt5.QtGui import QPainter, QColor
+
+        if self.qimage is None or self.qimage.isNull():
+            return
+        # 只重绘需要更新的区域，拖动时的耗时与选区大小有关，与屏幕分辨率无关
         painter = QPainter(self)
-        if hasattr(self, 'pixmap') and not self.pixmap.isNull():
-            painter.drawPixmap(self.rect(), self.pixmap)
-
-        # 绘制选择区域
-        if not self.begin.isNull() and not self.end.isNull():
-            rect = QRect(self.begin, self.end)
-            painter.setPen(QColor(255, 0, 0))
-            painter.drawRect(rect)
-
-            # 半透明填充选择区域外的部分
-            mask = QColor(0, 0, 0, 128)
-            painter.fillRect(0, 0, self.width(), self.begin.y(), mask)
-            painter.fillRect(0, self.end.y(), self.width(), self.height() - self.end.y(), mask)
-            painter.fillRect(0, self.begin.y(), self.begin.x(), self.end.y() - self.begin.y(), mask)
-            painter.fillRect(self.end.x(), self.begin.y(), self.width() - self.end.x(), self.end.y() - self.begin.y(), mask)
+        dirty = event.rect()
+        selection = self.selection_rect()
+        if selection is None:
+            self.draw_frame(painter, dirty)
+            return
+
+        # 选择区域外为缓存的调暗背景，区域内为原始截图
+        # 缓存的背景按设备像素绘制，源区域需要按缩放比例换算
+        ratio = self.devicePixelRatioF()
+        source = QRectF(dirty.x() * ratio, dirty.y() * ratio, dirty.width() * ratio, dirty.height() * ratio)
+        painter.drawPixmap(QRectF(dirty), self.dimmed_background(), source)
+        clear = selection.intersected(dirty)
+        if not clear.isEmpty():
+            self.draw_frame(painter, clear)
+        painter.setPen(QColor(255, 0, 0))
+        painter.drawRect(selection)
 
     def mousePressEvent(self, event):
+        # 开始选择时整屏变暗，需要重绘一次整个窗口
         self.begin = event.pos()
         self.end = event.pos()
         self.update()
 
     def mouseMoveEvent(self, event):
+        old = self.selection_rect()
         self.end = event.pos()
-        self.update()
+        new = self.selection_rect()
+        if old is None:
+            self.update()
+        else:
+            self.update(self.dirty_rect(old).united(self.dirty_rect(new)))
 
     def mouseReleaseEvent(self, event):
         self.end = event.pos()
         self.update()
+        if self.trace is not None:
+            self.trace.end("selection")
 
         # 确保选择区域有效
         if self.begin.x() > self.end.x():
@@ -153,13 +267,19 @@ class ScreenshotWidget(QWidget):
         width = abs(self.begin.x() - self.end.x())
         height = abs(self.begin.y() - self.end.y())
 
-        if width > 0 and height > 0:
-            # 从原始截图中裁剪选择区域
-            region = self.screenshot_np[y:y+height, x:x+width]
-            # 转换为PIL Image对象
-            pil_image = Image.fromarray(region)
-            self.screenshot_completed.emit(pil_image)
+        if width > 0 and height > 0 and self.buffer is not None:
+            # 窗口坐标换算为截图像素坐标（高DPI屏幕上两者不同）
+            scale_x = self.buffer.width / max(1, self.width())
+            scale_y = self.buffer.height / max(1, self.height())
+            left, top = int(x * scale_x), int(y * scale_y)
+            right, bottom = int((x + width) * scale_x), int((y + height) * scale_y)
+            # 选择区域是原始截图上的视图，不复制像素
+            with activate(self.trace), span("crop"):
+                region = self.buffer.crop(left, top, right, bottom)
+                self.release_frame()
+            self.screenshot_completed.emit(region)
         else:
+            self.release_frame()
             self.screenshot_completed.emit(None)
 
         self.close()
@@ -167,66 +287,247 @@ class ScreenshotWidget(QWidget):
     def keyPressEvent(self, event):
         # 按ESC取消截图
         if event.key() == Qt.Key_Escape:
+            self.release_frame()
             self.screenshot_completed.emit(None)
             self.close()
 
-class TranslatorAPI:
-    """翻译API调用类"""
+class TranslateTask(QRunnable):
+    """线程池中执行的单个翻译请求"""
 
-    # 创建一个会话对象以复用连接
-    _session = requests.Session()
+    def __init__(self, engine, generation, text, from_lang, to_lang, disk_cache=None, trace=None, memory=None):
+        super().__init__()
+        self.engine = engine
+        self.disk_cache = disk_cache
+        self.memory = memory
+        self.trace = trace
+        self.generation = generation
+        self.text = text
+        self.from_lang = from_lang
+        self.to_lang = to_lang
 
-    @classmethod
-    def baidu_translate(cls, text, from_lang="auto", to_lang="zh"):
-        """调用百度翻译API"""
-        if not text.strip():
-            return ""
-
-        app_id = config.BAIDU_APP_ID
-        secret_key = config.BAIDU_SECRET_KEY
-
-        if app_id == "YOUR_APP_ID" or secret_key == "YOUR_SECRET_KEY":
-            return "请在config.py中配置百度翻译API的APP_ID和SECRET_KEY"
-
-        url = "https://api.fanyi.baidu.com/api/trans/vip/translate"
-        salt = str(random.randint(32768, 65536))
-        sign = hashlib.md5((app_id + text + salt + secret_key).encode()).hexdigest()
-
-        payload = {
-            'appid': app_id,
-            'q': text,
-            'from': from_lang,
-            'to': to_lang,
-            'salt': salt,
-            'sign': sign
-        }
+    def run(self):
+        # 排队期间已有更新的编辑，直接丢弃，不再发起网络请求
+        if self.generation != self.engine.generation:
+            self.engine.skipped_count += 1
+            return
+        from translator_api import TranslatorAPI
+        if self.trace is not None:
+            self.trace.end("queue")
+        with activate(self.trace):
+            # 磁盘缓存的读写都在后台线程进行，数据库被其他进程锁住时不会卡住界面
+            cache_key = make_cache_key(self.text, self.from_lang, self.to_lang)
+            translated_text = None
+            if self.disk_cache is not None:
+                with span("disk_cache"):
+                    translated_text = self.disk_cache.get(cache_key)
+            if translated_text is None:
+                try:
+                    with span("request"):
+                        translated_text = TranslatorAPI.translate(self.text, self.from_lang, self.to_lang)
+                except Exception as e:
+                    translated_text = f"翻译过程出错: {str(e)}"
+                if self.disk_cache is not None and not TranslatorAPI.is_error(translated_text):
+                    with span("disk_cache"):
+                        self.disk_cache.put(cache_key, translated_text)
+                if self.memory is not None and not TranslatorAPI.is_error(translated_text):
+                    self.memory.add(self.text, self.from_lang, self.to_lang, translated_text)
+        # 信号属于主线程中的engine对象，跨线程发射时会自动排队到主线程处理
+        self.engine.translation_finished.emit(self.generation, self.text,
+                                              self.from_lang, self.to_lang, translated_text)
+
+
+class DocumentTask(QRunnable):
+    """线程池中执行的多段落文本翻译，分块并发翻译并按顺序回报进度"""
+
+    def __init__(self, engine, generation, text, from_lang, to_lang, cache=None, priority="interactive",
+                 trace=None, memory=None):
+        super().__init__()
+        self.priority = priority
+        self.trace = trace
+        self.memory = memory
+        self.engine = engine
+        self.generation = generation
+        self.text = text
+        self.from_lang = from_lang
+        self.to_lang = to_lang
+        self.cache = cache
+
+    def is_cancelled(self):
+        return self.generation != self.engine.generation
+
+    def on_chunk(self, index, total, translated):
+        self.engine.document_progress.emit(self.generation, index, total,
+                                           translated if translated is not None else "")
 
+    def run(self):
+        if self.is_cancelled():
+            self.engine.skipped_count += 1
+            return
+        translator = self.engine.document_translator()
+        if self.trace is not None:
+            self.trace.end("queue")
         try:
-            # 使用会话对象发送请求，可以复用连接
-            response = cls._session.post(url, data=payload, timeout=5)
-            result = response.json()
-
-            if "error_code" in result:
-                return f"翻译出错: {result['error_code']} - {result.get('error_msg', '未知错误')}"
-
-            if "trans_result" not in result:
-                return "翻译响应中缺少翻译结果"
-
-            # 优化字符串拼接
-            translated_parts = [item["dst"] for item in result["trans_result"]]
-            return "\n".join(translated_parts)
-
-        except requests.exceptions.Timeout:
-            return "翻译请求超时，请稍后重试"
-        except requests.exceptions.RequestException:
-            return "网络请求错误，请检查网络连接"
-        except ValueError:
-            return "API响应格式错误"
-        except Exception:
-            return "翻译过程出错，请稍后重试"
+            with activate(self.trace), span("request"):
+                translated_text, error = translator.translate(self.text, self.from_lang, self.to_lang,
+                                                              on_chunk=self.on_chunk,
+                                                              is_cancelled=self.is_cancelled,
+                                                              cache=self.cache, priority=self.priority)
+        except Exception as e:
+            translated_text, error = None, f"翻译过程出错: {str(e)}"
+        if self.memory is not None and not error and translated_text:
+            self.memory.add(self.text, self.from_lang, self.to_lang, translated_text)
+        self.engine.translation_finished.emit(self.generation, self.text, self.from_lang,
+                                              self.to_lang, error or translated_text)
+
+
+class TranslationEngine(QObject):
+    """异步翻译引擎
+
+    每个请求携带一个递增的代号(generation)，只有最新代号的结果会被采用，
+    被后续编辑取代的请求在排队时直接丢弃，已发出的请求结果返回后也会被忽略。
+    """
+    # 参数: generation, 原文, 源语言, 目标语言, 译文
+    translation_finished = pyqtSignal(int, str, str, str, str)
+    # 长文档分块进度，按原文顺序发出。参数: generation, 块序号, 总块数, 该块译文
+    document_progress = pyqtSignal(int, int, int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(config.TRANSLATE_WORKER_THREADS)
+        self.generation = 0
+        # 多段落文本的分块翻译器，各次翻译共用其线程池
+        self._document_translator = None
+        self._document_lock = threading.Lock()
+        # 统计信息
+        self.submitted_count = 0
+        self.skipped_count = 0
+        self.stale_count = 0
+
+    def submit(self, text, from_lang, to_lang, disk_cache=None, trace=None, memory=None):
+        """提交翻译请求，返回该请求的代号"""
+        self.generation += 1
+        # 清除尚未开始执行的旧请求
+        self.pool.clear()
+        self.submitted_count += 1
+        self.pool.start(TranslateTask(self, self.generation, text, from_lang, to_lang, disk_cache, trace, memory))
+        return self.generation
+
+    def document_translator(self):
+        """返回共用的分块翻译器，第一次使用时创建"""
+        with self._document_lock:
+            if self._document_translator is None:
+                from translator_api import TranslatorAPI
+                self._document_translator = DocumentTranslator(TranslatorAPI.translate_many,
+                                                               max_bytes=config.BAIDU_MAX_QUERY_BYTES,
+                                                               workers=config.DOCUMENT_WORKERS)
+            return self._document_translator
+
+    def submit_document(self, text, from_lang, to_lang, cache=None, priority="interactive", trace=None,
+                        memory=None):
+        """提交多段落文本的翻译请求，返回该请求的代号"""
+        self.generation += 1
+        self.pool.clear()
+        self.submitted_count += 1
+        self.pool.start(DocumentTask(self, self.generation, text, from_lang, to_lang, cache, priority, trace,
+                                     memory))
+        return self.generation
+
+    def cancel(self):
+        """作废所有未完成的请求"""
+        self.generation += 1
+        self.pool.clear()
+
+    def is_current(self, generation):
+        """判断结果是否属于最新的请求"""
+        if generation == self.generation:
+            return True
+        self.stale_count += 1
+        return False
+
+    def shutdown(self, timeout_ms=1000):
+        """退出前等待正在执行的请求结束，并关闭分块翻译的线程池"""
+        self.cancel()
+        self.pool.waitForDone(timeout_ms)
+        with self._document_lock:
+            translator, self._document_translator = self._document_translator, None
+        if translator is not None:
+            # 已作废的块在开始前就会返回，不等待进行中的网络请求
+            translator.shutdown(wait=False)
+
+
+class DebounceScheduler(QObject):
+    """尾沿防抖调度器
+
+    连续触发时只在最后一次触发后等待wait_ms再执行，把一串textChanged合并成一次请求；
+    同时用max_wait_ms限制最长等待时间，持续输入时也会定期执行。
+    """
+    fired = pyqtSignal()
+
+    def __init__(self, wait_ms, max_wait_ms, parent=None):
+        super().__init__(parent)
+        self.wait_ms = wait_ms
+        self.max_wait_ms = max_wait_ms
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fire)
+        # 当前这一串触发中第一次触发的时间
+        self._first_trigger_time = None
+        # 统计信息
+        self.trigger_count = 0
+        self.issued_count = 0
+        self.coalesced_count = 0
+
+    def trigger(self, wait_ms=None):
+        """触发一次，实际执行会推迟到触发停止之后"""
+        self.trigger_count += 1
+        now = time.monotonic()
+        if self._timer.isActive():
+            # 已有等待中的请求，本次触发被合并
+            self.coalesced_count += 1
+        else:
+            self._first_trigger_time = now
+
+        delay = self.wait_ms if wait_ms is None else wait_ms
+        # 不超过最长等待时间
+        remaining = self.max_wait_ms - int((now - self._first_trigger_time) * 1000)
+        self._timer.start(max(0, min(delay, remaining)))
+
+    def flush(self):
+        """立即执行等待中的请求"""
+        if self._timer.isActive():
+            self._timer.stop()
+            self._fire()
+
+    def cancel(self):
+        """取消等待中的请求"""
+        if self._timer.isActive():
+            self._timer.stop()
+            # 被取消的触发不算作已发出的请求
+            self.coalesced_count += 1
+        self._first_trigger_time = None
+
+    def is_pending(self):
+        return self._timer.isActive()
+
+    def stats(self):
+        """返回调度统计信息"""
+        return {
+            "triggered": self.trigger_count,
+            "issued": self.issued_count,
+            "coalesced": self.coalesced_count,
+        }
+
+    def _fire(self):
+        self._first_trigger_time = None
+        self.issued_count += 1
+        self.fired.emit()
+
 
 class TranslatorApp(QMainWindow):
     """翻译工具主窗口"""
+    # 全局热键在keyboard的线程中触发，通过信号转到界面线程执行截图
+    screenshot_requested = pyqtSignal()
 
     def __init__(self):
         super().__init__()
@@ -237,14 +538,20 @@ class TranslatorApp(QMainWindow):
 
     def handle_ocr_result(self, text):
         """处理OCR识别结果"""
+        trace, self._capture_trace = self._capture_trace, None
         # 将识别的文本显示在源文本框中
         self.source_text.setText(text)
 
         # 自动翻译
         if text.strip() and not text.startswith("OCR识别失败") and not text.startswith("请在config.py中配置"):
+            # 直接翻译（相同文本会命中翻译缓存），无需等待防抖；翻译阶段计入本次截图的耗时
+            self.translate_scheduler.cancel()
+            self._pending_trace = trace
             self.translate_text()
             self.statusBar().showMessage("OCR识别和翻译完成")
         else:
+            if trace is not None:
+                trace.finish("error")
             self.statusBar().showMessage("OCR识别结果: " + text)
             # 如果识别失败，提示手动输入
             if text.startswith("OCR识别失败") or text.startswith("请在config.py中配置"):
@@ -260,23 +567,9 @@ class TranslatorApp(QMainWindow):
 
         # 设置应用图标
         try:
-            # 尝试多种可能的图标路径
-            icon_paths = [
-                "ico.ico",  # 当前目录
-                os.path.join(os.path.dirname(os.path.abspath(__file__)), "ico.ico"),  # 脚本所在目录
-                os.path.join(os.path.dirname(sys.executable), "ico.ico"),  # 可执行文件所在目录
-                os.path.join(sys._MEIPASS, "ico.ico") if hasattr(sys, "_MEIPASS") else None  # PyInstaller打包时的临时目录
-            ]
-
-            # 尝试每个路径
-            app_icon = None
-            for path in icon_paths:
-                if path and os.path.exists(path):
-                    app_icon = QIcon(path)
-                    break
-
-            if app_icon:
-                self.setWindowIcon(app_icon)
+            icon_path = find_icon_path()
+            if icon_path:
+                self.setWindowIcon(QIcon(icon_path))
             else:
                 print("警告: 无法找到图标文件")
         except Exception as e:
@@ -416,6 +709,15 @@ class TranslatorApp(QMainWindow):
             font-weight: bold;
         """)
 
+        # 实时翻译按钮
+        self.watch_btn = QPushButton("实时翻译")
+        self.watch_btn.setToolTip("选择屏幕区域，区域内的文字变化时自动识别和翻译，适合游戏字幕和直播弹幕")
+        self.watch_btn.clicked.connect(self.toggle_watch)
+        self.watch_btn.setStyleSheet("""
+            background-color: #6f42c1;
+            color: white;
+        """)
+
         # 粘贴按钮
         self.paste_btn = QPushButton("粘贴")
         self.paste_btn.setToolTip("从剪贴板粘贴文本")
@@ -454,6 +756,7 @@ class TranslatorApp(QMainWindow):
         button_layout.addWidget(self.paste_btn)
         button_layout.addWidget(self.clear_btn)
         button_layout.addWidget(self.screenshot_btn)
+        button_layout.addWidget(self.watch_btn)
 
         # 将语言选择布局和按钮布局添加到主控制布局
         control_layout.addLayout(lang_layout, 3)  # 语言选择占据更多空间
@@ -531,17 +834,25 @@ class TranslatorApp(QMainWindow):
         """)
         status_bar.showMessage("就绪")
 
+        # 缓存统计信息显示在状态栏右侧
+        self.cache_status_label = QLabel()
+        self.cache_status_label.setStyleSheet("color: #888; font-size: 12px;")
+        status_bar.addPermanentWidget(self.cache_status_label)
+
+        # 实时翻译的帧数统计，只在实时翻译时显示
+        self.watch_status_label = QLabel()
+        self.watch_status_label.setStyleSheet("color: #6f42c1; font-size: 12px;")
+        self.watch_status_label.hide()
+        status_bar.addPermanentWidget(self.watch_status_label)
+
         # 设置快捷键
         # 使用数字键码方式设置快捷键，避免字符串解析问题
         # Ctrl(4194368) + Shift(4194368) + Alt(4194304) + Z(90)
         self.shortcut_screenshot = QShortcut(QKeySequence(Qt.ControlModifier | Qt.ShiftModifier | Qt.AltModifier | Qt.Key_Z), self)
         self.shortcut_screenshot.activated.connect(self.take_screenshot)
 
-        # 注册全局热键
-        try:
-            keyboard.add_hotkey('ctrl+shift+alt+z', self.take_screenshot)
-        except Exception:
-            pass
+        # 全局热键在窗口显示后注册
+        self.screenshot_requested.connect(self.take_screenshot)
 
         self.shortcut_paste = QShortcut(QKeySequence("Ctrl+V"), self)
         self.shortcut_paste.activated.connect(self.paste_from_clipboard)
@@ -549,9 +860,63 @@ class TranslatorApp(QMainWindow):
         self.shortcut_copy = QShortcut(QKeySequence("Ctrl+C"), self)
         self.shortcut_copy.activated.connect(self.copy_to_clipboard)
 
+        # F12查看最近请求的各阶段耗时
+        self.shortcut_timing = QShortcut(QKeySequence("F12"), self)
+        self.shortcut_timing.activated.connect(self.show_timing_breakdown)
+
         # 初始化截图线程
         self.screenshot_thread = None
+        self.screenshot_widget = None
+        # 是否正在等待窗口最小化后截图
+        self._capture_pending = False
+        # 实时翻译线程，以及本次截图是否用于选择实时翻译的区域
+        self.watch_thread = None
+        self._watch_requested = False
+        # 各阶段耗时：进行中的截图、截图后待翻译的、正在翻译的(代号, trace)
+        self._capture_trace = None
+        self._pending_trace = None
+        self._translate_trace = None
+
+        # 初始化异步翻译引擎
+        self.translation_engine = TranslationEngine(self)
+        self.translation_engine.translation_finished.connect(self.handle_translate_result)
+        self.translation_engine.document_progress.connect(self.handle_document_progress)
+
+        # 窗口显示后再做不影响首次绘制的初始化
+        QTimer.singleShot(0, self.deferred_init)
+
+        # 自动翻译调度器，合并连续输入触发的翻译请求
+        self.translate_scheduler = DebounceScheduler(config.AUTO_TRANSLATE_DELAY_MS,
+                                                     config.AUTO_TRANSLATE_MAX_WAIT_MS, self)
+        self.translate_scheduler.fired.connect(self.translate_text)
+
+
+    def deferred_init(self):
+        """启动后的延迟初始化：注册全局热键，并在后台线程中准备缓存和网络连接"""
+        try:
+            import keyboard
+            keyboard.add_hotkey('ctrl+shift+alt+z', self.screenshot_requested.emit)
+        except Exception:
+            pass
+        threading.Thread(target=self.background_init, daemon=True).start()
+
+    @classmethod
+    def background_init(cls):
+        """在后台线程中打开磁盘缓存、预热网络连接和OCR的access_token"""
+        cls.open_disk_cache()
+        cls.open_translation_memory()
+
+        from http_client import get_client
+        from providers import get_router
+        from ocr import OCREngine, OCR_URL
 
+        # 预热各翻译服务商和OCR接口的连接，首次请求无需等待握手
+        get_router().warm_up()
+        get_client().warm_up([OCR_URL])
+
+        # 提前准备OCR的access_token，首次截图无需等待认证
+        if OCREngine.credentials_error() is None:
+            cls.ocr_engine().token_manager.prefetch()
 
     def swap_languages(self):
         """交换源语言和目标语言"""
@@ -601,12 +966,46 @@ class TranslatorApp(QMainWindow):
         # 检查是否有正在运行的截图线程
         if hasattr(self, 'screenshot_thread') and self.screenshot_thread is not None and self.screenshot_thread.isRunning():
             return
+        if self._capture_pending:
+            return
+        # 重新截图时停止实时翻译，避免两边同时更新文本框
+        self.stop_watch()
 
-        self.setWindowState(Qt.WindowMinimized)
         self.statusBar().showMessage("正在准备截图...")
+        self._capture_trace = get_metrics().start_trace("capture")
+        self._capture_trace.begin("minimize")
+
+        if self.isMinimized() or not self.isVisible():
+            # 窗口已不在屏幕上，直接截图
+            self.start_capture()
+            return
 
+        # 等窗口真正最小化(changeEvent)后再截图，而不是固定等待一段时间
+        self._capture_pending = True
+        self.setWindowState(Qt.WindowMinimized)
+        # 窗口管理器没有发出最小化事件时的兜底
+        QTimer.singleShot(config.CAPTURE_MINIMIZE_TIMEOUT_MS, self.start_pending_capture)
+
+    def changeEvent(self, event):
+        """窗口状态变化：最小化完成后开始截图"""
+        if (event.type() == QEvent.WindowStateChange and self._capture_pending
+                and self.isMinimized()):
+            # 留出窗口管理器完成重绘的时间
+            QTimer.singleShot(config.CAPTURE_SETTLE_MS, self.start_pending_capture)
+        super().changeEvent(event)
+
+    def start_pending_capture(self):
+        """开始等待中的截图"""
+        if self._capture_pending:
+            self._capture_pending = False
+            self.start_capture()
+
+    def start_capture(self):
+        """启动截图线程"""
+        if self._capture_trace is not None:
+            self._capture_trace.end("minimize")
         # 创建并启动截图线程
-        self.screenshot_thread = ScreenshotThread()
+        self.screenshot_thread = ScreenshotThread(self._capture_trace)
         self.screenshot_thread.screenshot_taken.connect(self.process_screenshot)
         self.screenshot_thread.finished.connect(self.on_screenshot_thread_finished)
         self.screenshot_thread.start()
@@ -621,106 +1020,91 @@ class TranslatorApp(QMainWindow):
 
     def process_screenshot(self, screenshot):
         """处理截图"""
+        trace = self._capture_trace
         if screenshot is not None:
             try:
                 # 创建截图选择窗口
-                self.screenshot_widget = ScreenshotWidget(screenshot)
-                self.screenshot_widget.screenshot_completed.connect(self.process_selected_area)
-                self.screenshot_widget.show()
+                with activate(trace), span("overlay"):
+                    self.screenshot_widget = ScreenshotWidget(screenshot, trace)
+                    # 全屏数据由选择窗口持有，这里不再保留引用
+                    del screenshot
+                    self.screenshot_widget.screenshot_completed.connect(self.process_selected_area)
+                    self.screenshot_widget.show()
+                if trace is not None:
+                    trace.begin("selection")
             except Exception as e:
                 self.statusBar().showMessage(f"截图处理出错: {str(e)}")
                 self.setWindowState(Qt.WindowActive)
+                self.finish_capture_trace("error")
         else:
             self.statusBar().showMessage("截图失败")
             self.setWindowState(Qt.WindowActive)
+            self.finish_capture_trace("error")
+
+    def finish_capture_trace(self, status):
+        """截图流程提前结束（取消或出错）时结束计时"""
+        if self._capture_trace is not None:
+            self._capture_trace.finish(status)
+            self._capture_trace = None
+
+    # OCR识别流程（token、预处理器、结果缓存），所有OCR任务共享
+    _ocr_engine = None
+
+    @classmethod
+    def ocr_engine(cls):
+        """返回共享的OCR识别流程"""
+        if cls._ocr_engine is None:
+            from ocr import OCREngine
+            cls._ocr_engine = OCREngine.from_config()
+        return cls._ocr_engine
 
     def ocr_with_baidu_api(self, image):
         """使用百度OCR API识别图片中的文字"""
         self.statusBar().showMessage("正在进行OCR识别，请稍候...")
         QApplication.processEvents()
-
-        # 百度OCR API配置
-        api_key = config.BAIDU_OCR_API_KEY
-        secret_key = config.BAIDU_OCR_SECRET_KEY
-
-
-
-        # 如果没有配置API密钥，返回提示信息
-        if api_key == "YOUR_OCR_API_KEY" or secret_key == "YOUR_OCR_SECRET_KEY":
-            error_msg = "请在config.py中配置百度OCR API的API_KEY和SECRET_KEY"
-            return error_msg
-
+        return self.recognize_image(image)
+
+    def recognize_image(self, image):
+        """识别图像中的文字，不操作界面，可在后台线程中调用"""
+        # 配置了翻译服务时交给服务识别，服务不可用时直接调用百度接口
+        if config.TRANSLATION_SERVICE_URL and image is not None:
+            text = self.ocr_via_service(image)
+            if text is not None:
+                return text
+
+        text, _ = self.ocr_engine().recognize(image)
+        return text
+
+    def ocr_via_service(self, image):
+        """通过翻译服务识别，服务不可用时返回None"""
+        from translator_api import TranslatorAPI
         try:
-            # 获取access_token
-            token_url = f"https://aip.baidubce.com/oauth/2.0/token?grant_type=client_credentials&client_id={api_key}&client_secret={secret_key}"
-            response = requests.get(token_url)
-            response_json = response.json()
-
-            access_token = response_json.get("access_token")
-
-            if not access_token:
-                error_msg = f"OCR认证失败: {response_json}"
-                return error_msg
-
-
-
-            # 调用通用文字识别API
-            ocr_url = f"https://aip.baidubce.com/rest/2.0/ocr/v1/general_basic?access_token={access_token}"
-
-            # 将PIL图像转换为二进制数据
-            import io
-            img_byte_arr = io.BytesIO()
-
-            # 检查图像是否为空
-            if image is None:
-                return "图像为空，无法进行OCR识别"
-
-
-
-            try:
-                # 尝试保存图像
-                image.save(img_byte_arr, format='PNG')
-                img_data = img_byte_arr.getvalue()
-                img = base64.b64encode(img_data)
-            except Exception as save_error:
-                return f"OCR处理图像出错: {str(save_error)}"
-
-            params = {"image": img}
-            headers = {'content-type': 'application/x-www-form-urlencoded'}
-
-            response = requests.post(ocr_url, data=params, headers=headers)
-            result = response.json()
-
-            # 提取文本
-            if "words_result" in result:
-                text = ""
-                for item in result["words_result"]:
-                    text += item["words"] + "\n"
-                return text.strip()
-            else:
-                error_msg = f"OCR识别失败: {result.get('error_msg', '未知错误')}"
-                return error_msg
-        except Exception as e:
-            error_msg = f"OCR API调用出错: {str(e)}"
-            return error_msg
+            # 在本地预处理，减少上传到服务的数据量
+            img_data, _ = self.ocr_engine().preprocessor.process(image)
+            # 标记为已预处理，服务直接上传，不再重新编码
+            result = TranslatorAPI.service_call("/ocr", {"image": base64.b64encode(img_data).decode("ascii"),
+                                                         "encoded": True})
+            return result["error"] or result["text"]
+        except Exception:
+            return None
 
     def process_selected_area(self, image):
         """处理选择的截图区域并进行翻译，不保存到本地"""
         self.setWindowState(Qt.WindowActive)
-
-        if image:
+        # 选择窗口关闭后自动销毁
+        self.screenshot_widget = None
+        watch_requested, self._watch_requested = self._watch_requested, False
+
+        if image is not None and watch_requested:
+            self.finish_capture_trace("watch")
+            self.start_watch(image)
+        elif image is not None:
             try:
                 # 复制到剪贴板
-                clipboard = QApplication.clipboard()
-                # 将PIL图像转换为QPixmap
-                img_array = np.array(image)
-                height, width, channel = img_array.shape
-                bytes_per_line = 3 * width
-                if channel == 3:  # RGB
-                    qimg = QImage(img_array.data, width, height, bytes_per_line, QImage.Format_RGB888)
-                else:  # RGBA
-                    qimg = QImage(img_array.data, width, height, img_array.strides[0], QImage.Format_RGBA8888)
-                clipboard.setPixmap(QPixmap.fromImage(qimg))
+                with activate(self._capture_trace), span("clipboard"):
+                    # 剪贴板的内容在缓冲区回收后仍会被读取，需要独立的内存，
+                    # 这是选区唯一一次整块复制
+                    QApplication.clipboard().setImage(image.qimage_copy("clipboard"))
 
                 self.statusBar().showMessage("截图已复制到剪贴板")
 
@@ -737,7 +1121,7 @@ class TranslatorApp(QMainWindow):
                         pass
 
                 # 创建OCR线程，避免阻塞主线程
-                self.ocr_thread = OCRThread(image, self)
+                self.ocr_thread = OCRThread(image, self, self._capture_trace)
                 self.ocr_thread.ocr_completed.connect(self.handle_ocr_result)
                 self.ocr_thread.finished.connect(self.on_ocr_thread_finished)
                 self.ocr_thread.start()
@@ -747,12 +1131,14 @@ class TranslatorApp(QMainWindow):
             except Exception as e:
                 error_msg = f"处理截图出错: {str(e)}"
                 self.statusBar().showMessage(error_msg)
+                self.finish_capture_trace("error")
 
                 # 显示错误对话框
                 QMessageBox.critical(self, "截图处理错误",
                                     f"处理截图时出错: {str(e)}")
         else:
             self.statusBar().showMessage("已取消截图")
+            self.finish_capture_trace("cancelled")
 
     def on_ocr_thread_finished(self):
         """当OCR线程完成时清理资源"""
@@ -766,6 +1152,69 @@ class TranslatorApp(QMainWindow):
         else:
             pass
 
+    def toggle_watch(self):
+        """开始选择实时翻译的区域，或停止正在进行的实时翻译"""
+        if self.watch_thread is not None:
+            self.stop_watch()
+            self.statusBar().showMessage("已停止实时翻译")
+            return
+        # 已有截图在进行时不改变状态
+        if self._capture_pending or self.screenshot_thread is not None or self.screenshot_widget is not None:
+            return
+        self._watch_requested = True
+        self.take_screenshot()
+
+    def start_watch(self, region):
+        """开始监视选定的区域"""
+        from region_watch import RegionWatcher, FrameChangeDetector, virtual_screen_origin
+
+        # 选区在整屏截图中的像素坐标换算为屏幕坐标，之后只截取这一块
+        origin_x, origin_y = virtual_screen_origin()
+        left, top = region.origin[0] + origin_x, region.origin[1] + origin_y
+        bbox = (left, top, left + region.width, top + region.height)
+        detector = FrameChangeDetector(config.WATCH_CHANGE_RATIO, config.WATCH_PIXEL_DELTA,
+                                       config.WATCH_STABLE_FRAMES, config.WATCH_MAX_UNSTABLE_FRAMES)
+        watcher = RegionWatcher(bbox, self.recognize_image, detector)
+
+        self.watch_thread = WatchThread(watcher, config.WATCH_INTERVAL_MS, self)
+        self.watch_thread.text_changed.connect(self.handle_watch_text)
+        self.watch_thread.stats_updated.connect(self.update_watch_status)
+        self.watch_thread.start()
+        self.watch_btn.setText("停止实时翻译")
+        self.watch_status_label.show()
+        self.statusBar().showMessage("实时翻译中，区域内的文字变化时自动更新")
+
+    def stop_watch(self):
+        """停止实时翻译"""
+        if self.watch_thread is None:
+            return
+        thread, self.watch_thread = self.watch_thread, None
+        thread.text_changed.disconnect()
+        thread.stats_updated.disconnect()
+        thread.stop()
+        # 不等待进行中的识别结束，线程在本次识别后自行退出（关闭窗口时另行等待）
+        thread.finished.connect(thread.deleteLater)
+        self.watch_btn.setText("实时翻译")
+        self.watch_status_label.hide()
+
+    def handle_watch_text(self, text):
+        """实时翻译识别出新的文字：原地更新原文和译文"""
+        if text.startswith(("OCR", "请在config.py中配置", "实时翻译出错", "图像为空")):
+            self.statusBar().showMessage("实时翻译: " + text)
+            if text.startswith("请在config.py中配置"):
+                self.stop_watch()
+            return
+        self.source_text.setText(text)
+        # 直接翻译，不等待防抖（相同的文字会命中翻译缓存）
+        self.translate_scheduler.cancel()
+        self.translate_text()
+
+    def update_watch_status(self, stats):
+        """在状态栏显示实时翻译的帧数统计"""
+        self.watch_status_label.setText(
+            f"实时翻译: 截图 {stats['frames_captured']} 帧 | 跳过 {stats['frames_skipped']} 帧 | "
+            f"识别 {stats['ocr_calls']} 次 | 节省API调用 {stats['api_calls_saved']} 次")
+
     def paste_from_clipboard(self):
         """从剪贴板粘贴文本"""
         clipboard = QApplication.clipboard()
@@ -804,55 +1253,112 @@ class TranslatorApp(QMainWindow):
 
     def clear_text(self):
         """清空文本框"""
+        self.translate_scheduler.cancel()
+        self.translation_engine.cancel()
         self.source_text.clear()
         self.result_text.clear()
         self.statusBar().showMessage("已清空文本")
 
-    # 上次翻译的时间
-    _last_translate_time = 0
-
     def auto_translate(self):
         """自动翻译（当源文本变化时）"""
-        import time
-
         text = self.source_text.toPlainText().strip()
 
         # 如果文本为空，清空结果
         if not text:
+            self.translate_scheduler.cancel()
+            self.translation_engine.cancel()
             self.result_text.clear()
             return
 
-        # 获取当前时间
-        current_time = time.time()
-
-        # 根据文本长度决定防抖动时间
-        if len(text) < 50:  # 很短的文本立即翻译
-            debounce_time = 0
-        elif len(text) < 200:  # 中等长度的文本等待300毫秒
-            debounce_time = 0.3
-        else:  # 长文本等待800毫秒
-            debounce_time = 0.8
+        # 根据文本长度决定防抖动时间，长文本等待更久再翻译
+        if len(text) < 200:
+            delay = config.AUTO_TRANSLATE_DELAY_MS
+        else:
+            delay = config.AUTO_TRANSLATE_LONG_TEXT_DELAY_MS
 
-        # 如果距离上次翻译的时间足够长，则翻译
-        if current_time - self._last_translate_time > debounce_time:
-            self._last_translate_time = current_time
-            self.translate_text()
+        # 交给调度器，停止输入后才真正翻译
+        self.translate_scheduler.trigger(delay)
 
     def on_language_changed(self, _):
         """当语言选择变化时触发翻译"""
         if self.source_text.toPlainText().strip():
+            self.translate_scheduler.cancel()
             self.translate_text()
 
+    def translation_stats(self):
+        """返回自动翻译的统计信息，用于评估节省的API调用次数"""
+        from providers import get_router
+        stats = self.translate_scheduler.stats()
+        stats.update({
+            "submitted": self.translation_engine.submitted_count,
+            "skipped": self.translation_engine.skipped_count,
+            "stale": self.translation_engine.stale_count,
+            "providers": get_router().stats(),
+        })
+        if self._translation_memory is not None:
+            stats["memory"] = self._translation_memory.stats()
+        return stats
+
     def adjustComboBoxWidths(self):
         """调整下拉菜单的宽度以适应最长的选项"""
         # 不需要额外调整，因为我们已经设置了固定宽度
         pass
 
-    # 翻译缓存字典
-    _translation_cache = {}
+    # 内存热缓存，按字节数限制容量的LRU
+    _translation_cache = LRUCache(config.MEMORY_CACHE_MAX_KB * 1024)
+    # 磁盘缓存，跨会话共享
+    _disk_cache = None
+
+    @classmethod
+    def open_disk_cache(cls):
+        """打开磁盘缓存，失败时只使用内存缓存"""
+        if cls._disk_cache is not None or not config.DISK_CACHE_ENABLED:
+            return
+        try:
+            cls._disk_cache = DiskCache(config.DISK_CACHE_PATH,
+                                        ttl=config.DISK_CACHE_TTL_DAYS * 86400,
+                                        max_bytes=config.DISK_CACHE_MAX_MB * 1024 * 1024)
+        except Exception as e:
+            print(f"打开磁盘缓存出错: {str(e)}")
+
+    # 翻译记忆，按相似度查找翻译过的相近原文
+    _translation_memory = None
+
+    @classmethod
+    def open_translation_memory(cls):
+        """创建翻译记忆并在后台线程中从文件载入（载入期间已可使用，新翻译的条目同时加入）"""
+        if cls._translation_memory is not None or not config.TM_ENABLED:
+            return
+        from translation_memory import TranslationMemory
+        try:
+            memory = TranslationMemory(config.TM_SUGGEST_SCORE, config.TM_MAX_SEGMENTS,
+                                       config.TM_MIN_CHARS, config.TM_MAX_CHARS, config.TM_PATH)
+        except Exception as e:
+            print(f"打开翻译记忆出错: {str(e)}")
+            return
+        cls._translation_memory = memory
+        # 建立索引较慢（十万条约需十秒），在单独的线程中载入，不推迟连接预热和access_token的获取
+        threading.Thread(target=memory.load, daemon=True).start()
+
+    # 本次翻译在翻译记忆中找到的相近条目：(代号, (相似度, 译文, 条目的原文))
+    _memory_match = None
+
+    def show_memory_match(self, generation, match):
+        """先显示翻译记忆中相近条目的译文：相似度高时直接显示在结果区域，否则在状态栏给出建议"""
+        score, translation, _ = match
+        self._memory_match = (generation, match)
+        if score >= config.TM_AUTO_APPLY_SCORE:
+            self._rendered_chunks = []
+            self.set_result_text(translation)
+            self.statusBar().showMessage(f"已显示翻译记忆中的相近译文 (相似度 {score:.0%})，正在获取准确译文...")
+        else:
+            preview = translation if len(translation) <= 40 else translation[:40] + "..."
+            self.statusBar().showMessage(f"翻译记忆建议 (相似度 {score:.0%}): {preview}  正在获取准确译文...")
 
     def translate_text(self):
         """翻译文本"""
+        # 截图识别后的翻译沿用截图的计时，其他情况单独计时
+        trace, self._pending_trace = self._pending_trace, None
         text = self.source_text.toPlainText().strip()
         if not text:
             return
@@ -865,49 +1371,187 @@ class TranslatorApp(QMainWindow):
             self.statusBar().showMessage("语言选择错误")
             return
 
-        # 检查缓存
-        cache_key = f"{text}|{from_lang}|{to_lang}"
-        if cache_key in self._translation_cache:
-            self.result_text.setText(self._translation_cache[cache_key])
+        # 被本次翻译取代的请求不再计时
+        if self._translate_trace is not None:
+            self._translate_trace[1].finish("superseded")
+            self._translate_trace = None
+        if trace is None:
+            trace = get_metrics().start_trace("translate")
+
+        # 界面线程只查内存缓存，磁盘缓存由后台任务查询，命中的结果返回后提升到内存缓存
+        with trace.span("cache"):
+            cache_key = make_cache_key(text, from_lang, to_lang)
+            cached = self._translation_cache.get(cache_key)
+        if cached is not None:
+            # 作废仍在进行中的旧请求，避免其结果覆盖缓存结果
+            self.translation_engine.cancel()
+            self._rendered_chunks = []
+            with trace.span("render"):
+                self.set_result_text(cached)
+            trace.finish("cached")
             self.statusBar().showMessage("翻译完成 (从缓存)")
+            self.update_cache_status()
             return
 
+        # 在翻译记忆中查找相近的原文，准确译文返回前先显示
+        match = None
+        if self._translation_memory is not None:
+            with trace.span("memory"):
+                match = self._translation_memory.lookup(text, from_lang, to_lang)
+
         # 更新状态栏
         self.statusBar().showMessage("正在翻译...")
 
+        # 提交到线程池异步翻译，结果通过handle_translate_result返回
+        trace.begin("queue")
+        oversized = len(text.encode("utf-8")) > config.BAIDU_MAX_QUERY_BYTES
+        if "\n" in text or oversized:
+            # 多段落文本按段落缓存（内存和磁盘两级），编辑后只翻译改动的段落；
+            # 超过单次请求上限的长文档分块并发翻译，译文逐块显示
+            priority = "bulk" if oversized else "interactive"
+            self._pending_chunks = []
+            trace.begin("first_chunk")
+            generation = self.translation_engine.submit_document(text, from_lang, to_lang,
+                                                                 TieredCache(self._translation_cache,
+                                                                             self._disk_cache),
+                                                                 priority, trace, self._translation_memory)
+        else:
+            self._rendered_chunks = []
+            generation = self.translation_engine.submit(text, from_lang, to_lang, self._disk_cache, trace,
+                                                        self._translation_memory)
+        self._translate_trace = (generation, trace)
+        if match is not None:
+            self.show_memory_match(generation, match)
+
+    # 当前显示的译文对应的各块译文，用于逐块更新时保留尚未返回的部分
+    _rendered_chunks = []
+
+    def handle_document_progress(self, generation, index, total, translated):
+        """一块翻译完成，原地更新结果区域"""
+        if generation != self.translation_engine.generation:
+            return
+        if index == 0 and self._translate_trace is not None:
+            self._translate_trace[1].end("first_chunk")
+        self._pending_chunks.append(translated)
+        display = "".join(self._pending_chunks)
+        # 块数不变时（通常是编辑已有文档），后面的块先沿用之前的译文
+        if len(self._rendered_chunks) == total:
+            display += "".join(self._rendered_chunks[index + 1:])
+        self.set_result_text(display)
+        if index + 1 == total:
+            self._rendered_chunks = self._pending_chunks
+        self.statusBar().showMessage(f"正在翻译... ({index + 1}/{total})")
+
+    def set_result_text(self, text):
+        """原地更新译文，只替换变化的部分，避免整体重新渲染"""
+        old = self.result_text.toPlainText()
+        if old == text:
+            return
+        start, end, replacement = diff_range(old, text)
+        # Qt中的文本位置以UTF-16编码单元计算
+        qt_start = len(old[:start].encode("utf-16-le")) // 2
+        qt_end = qt_start + len(old[start:end].encode("utf-16-le")) // 2
+        cursor = self.result_text.textCursor()
+        cursor.setPosition(qt_start)
+        cursor.setPosition(qt_end, cursor.KeepAnchor)
+        cursor.insertText(replacement)
+
+    def handle_translate_result(self, generation, text, from_lang, to_lang, translated_text):
+        """处理异步翻译结果"""
+        from translator_api import TranslatorAPI
+        # 丢弃已被新编辑取代的结果
+        if not self.translation_engine.is_current(generation):
+            return
+
+        trace = None
+        if self._translate_trace is not None and self._translate_trace[0] == generation:
+            trace = self._translate_trace[1]
+            self._translate_trace = None
+
         try:
-            # 调用翻译API
-            translated_text = TranslatorAPI.baidu_translate(text, from_lang, to_lang)
-
-            # 检查错误
-            if any(translated_text.startswith(err) for err in [
-                "翻译出错", "网络请求错误",
-                "API响应格式错误", "翻译过程出错"]):
-                self.statusBar().showMessage(translated_text)
+            # 检查错误（长文档已显示的部分保留）
+            if TranslatorAPI.is_error(translated_text):
+                if trace is not None:
+                    trace.finish("error")
+                # 翻译失败时退回翻译记忆中相近条目的译文
+                if self._memory_match is not None and self._memory_match[0] == generation:
+                    score, translation, _ = self._memory_match[1]
+                    self.set_result_text(translation)
+                    self.statusBar().showMessage(f"{translated_text}（已显示翻译记忆中相似度 {score:.0%} 的译文）")
+                else:
+                    self.statusBar().showMessage(translated_text)
                 return
 
-            # 更新结果和缓存
-            self.result_text.setText(translated_text)
-            self._translation_cache[cache_key] = translated_text
-
-            # 限制缓存大小
-            if len(self._translation_cache) > 100:
-                # 删除最早的缓存项
-                self._translation_cache.pop(next(iter(self._translation_cache)))
+            # 更新结果和缓存（磁盘缓存已由后台线程读写）
+            with activate(trace), span("render"):
+                self.set_result_text(translated_text)
+            if trace is not None:
+                trace.finish("ok")
+            cache_key = make_cache_key(text, from_lang, to_lang)
+            self._translation_cache.put(cache_key, translated_text)
 
             self.statusBar().showMessage("翻译完成")
+            self.update_cache_status()
 
         except Exception as e:
             self.statusBar().showMessage(f"翻译错误: {str(e)}")
 
+    def cache_stats(self):
+        """返回各级翻译缓存的统计信息"""
+        stats = {"memory": self._translation_cache.stats()}
+        if self._disk_cache is not None:
+            stats["disk"] = self._disk_cache.stats()
+        return stats
+
+    def update_cache_status(self):
+        """在状态栏显示缓存命中率和内存占用"""
+        stats = self._translation_cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        self.cache_status_label.setText(
+            f"缓存命中 {stats['hit_rate']:.0%} ({stats['hits']}/{lookups}) | "
+            f"{stats['bytes'] / 1024:.0f}/{stats['max_bytes'] / 1024:.0f} KB | "
+            f"淘汰 {stats['evictions']}")
+
+    def show_timing_breakdown(self):
+        """显示最近几次截图和翻译的各阶段耗时"""
+        registry = get_metrics()
+        traces = registry.recent_traces(8)
+        if not traces:
+            QMessageBox.information(self, "耗时明细", "还没有完成的截图或翻译请求")
+            return
+        text = "\n\n".join(trace.breakdown() for trace in reversed(traces))
+        text += "\n\n分位数（最近请求）:\n" + registry.summary()
+        QMessageBox.information(self, "耗时明细", text)
+
+    def closeEvent(self, event):
+        """关闭窗口时停止后台翻译"""
+        # 实时翻译线程（包括之前停止但仍在识别的）必须在窗口销毁前退出，
+        # 停止标志在截图和识别之间检查，最多等待一次识别
+        self.stop_watch()
+        for thread in self.findChildren(WatchThread):
+            thread.wait()
+        self.translation_engine.shutdown()
+        get_metrics().export()
+        super().closeEvent(event)
+
 def show_debug_info():
     """显示调试信息"""
+    try:
+        from PIL import Image
+        pil_version = getattr(Image, '__version__', '未知')
+    except ImportError:
+        pil_version = '未安装'
+    try:
+        import numpy as np
+        numpy_version = getattr(np, '__version__', '未知')
+    except ImportError:
+        numpy_version = '未安装'
     debug_info = [
         f"Python版本: {sys.version}",
         f"OS类型: {os.name}",
-        f"PIL版本: {Image.__version__ if hasattr(Image, '__version__') else '未知'}",
+        f"PIL版本: {pil_version}",
         f"PyQt5版本: {Qt.QT_VERSION_STR if hasattr(Qt, 'QT_VERSION_STR') else '未知'}",
-        f"NumPy版本: {np.__version__ if hasattr(np, '__version__') else '未知'}"
+        f"NumPy版本: {numpy_version}"
     ]
     return "\n".join(debug_info)
 
@@ -928,31 +1572,14 @@ def main():
         os.environ['QT_LOGGING_RULES'] = '*.debug=false;*.warning=false;*.critical=false'
 
         # 初始化应用
-        debug_info = show_debug_info()
         app = QApplication(sys.argv)
 
         # 在应用程序级别设置图标
         try:
-            from PyQt5.QtGui import QIcon
-
-            # 尝试多种可能的图标路径
-            icon_paths = [
-                "ico.ico",  # 当前目录
-                os.path.join(os.path.dirname(os.path.abspath(__file__)), "ico.ico"),  # 脚本所在目录
-                os.path.join(os.path.dirname(sys.executable), "ico.ico"),  # 可执行文件所在目录
-                os.path.join(sys._MEIPASS, "ico.ico") if hasattr(sys, "_MEIPASS") else None  # PyInstaller打包时的临时目录
-            ]
-
-            # 尝试每个路径
-            app_icon = None
-            for path in icon_paths:
-                if path and os.path.exists(path):
-                    app_icon = QIcon(path)
-                    print(f"找到图标文件: {path}")
-                    break
-
-            if app_icon:
-                app.setWindowIcon(app_icon)
+            icon_path = find_icon_path()
+            if icon_path:
+                app.setWindowIcon(QIcon(icon_path))
+                print(f"找到图标文件: {icon_path}")
             else:
                 print("警告: 无法找到图标文件")
         except Exception as e:
@@ -970,7 +1597,8 @@ def main():
         sys.exit(app.exec_())
     except Exception as e:
         # 显示错误对话框
-        error_msg = f"程序发生错误: {str(e)}\n\n调试信息:\n{debug_info if 'debug_info' in locals() else ''}"
+        # 调试信息只在出错时收集，避免启动时加载PIL和NumPy
+        error_msg = f"程序发生错误: {str(e)}\n\n调试信息:\n{show_debug_info()}"
         if QApplication.instance():
             QMessageBox.critical(None, "错误", error_msg)
         else:
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+翻译API
+不依赖界面库，图形界面、命令行和服务模式共用
+"""
+
+from collections import namedtuple, OrderedDict
+
+import requests
+
+import config
+from cache import make_cache_key
+from http_client import get_client
+from providers import get_router
+
+
+# 批量翻译中单个段落的结果：译文、错误信息（成功时为None）、是否来自缓存
+SegmentResult = namedtuple("SegmentResult", ["text", "error", "cached"])
+
+
+class TranslatorAPI:
+    """翻译API调用类"""
+
+    # 翻译出错时返回文本的前缀
+    ERROR_PREFIXES = ("翻译出错", "网络请求错误", "翻译请求超时", "API响应格式错误",
+                      "翻译过程出错", "翻译响应中缺少翻译结果", "请在config.py中配置")
+
+    @classmethod
+    def is_error(cls, text):
+        """判断翻译结果是否为错误信息"""
+        return text.startswith(cls.ERROR_PREFIXES)
+
+    @staticmethod
+    def api_call_count():
+        """翻译接口实际发出的请求次数（所有服务商合计）"""
+        return get_router().call_count()
+
+    @classmethod
+    def _credentials_error(cls):
+        """检查翻译API密钥，没有任何服务商可用时返回提示信息"""
+        return get_router().credentials_error()
+
+    @classmethod
+    def _request(cls, lines, from_lang, to_lang, priority="interactive"):
+        """发送一次翻译请求，返回(每行译文的列表, 错误信息)
+
+        由路由器选择服务商，请求先经过该服务商的限流器；失败时自动换用其他服务商。
+        """
+        return get_router().translate(lines, from_lang, to_lang, priority)
+
+    @classmethod
+    def service_call(cls, path, payload):
+        """调用本地翻译服务(translate_service.py)，返回响应的JSON对象"""
+        headers = {}
+        if config.SERVICE_TOKEN:
+            headers["X-Service-Token"] = config.SERVICE_TOKEN
+        response = get_client().post(config.TRANSLATION_SERVICE_URL.rstrip("/") + path,
+                                     endpoint="service", json=payload, headers=headers,
+                                     idempotent=True)
+        return response.json()
+
+    @classmethod
+    def translate(cls, text, from_lang="auto", to_lang="zh", priority="interactive"):
+        """翻译一段文本，语言代码使用config.LANGUAGES中的代码"""
+        if not text.strip():
+            return ""
+
+        # 配置了翻译服务时交给服务处理，服务不可用时直接调用翻译接口
+        if config.TRANSLATION_SERVICE_URL:
+            try:
+                result = cls.service_call("/translate", {"text": text, "from": from_lang, "to": to_lang})
+                return result["error"] or result["text"]
+            except (requests.exceptions.RequestException, ValueError, KeyError):
+                pass
+
+        error = cls._credentials_error()
+        if error:
+            return error
+
+        translated_parts, error = cls._request([text], from_lang, to_lang, priority)
+        if error:
+            return error
+        # 优化字符串拼接
+        return "\n".join(translated_parts)
+
+    @staticmethod
+    def _pack(lines, max_bytes):
+        """把待翻译的行按字节上限打包，每包用换行连接后作为一次请求"""
+        batch, batch_bytes = [], 0
+        for item in lines:
+            # 加上换行符的1字节
+            size = len(item[2].encode("utf-8")) + 1
+            if batch and batch_bytes + size > max_bytes:
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(item)
+            batch_bytes += size
+        if batch:
+            yield batch
+
+    @classmethod
+    def translate_many(cls, segments, from_lang="auto", to_lang="zh", cache=None, priority="interactive"):
+        """批量翻译多段文本
+
+        翻译接口对多行文本逐行返回译文，因此把各段按行拆开，
+        在字节上限内打包成尽量少的请求，再按原顺序组装回各段。
+        cache为可选的缓存对象(get/put)，命中的段落不发请求；priority为限流类别(interactive/bulk)。
+        返回与segments一一对应的SegmentResult列表，失败的段落带有错误信息。
+        """
+        results = [None] * len(segments)
+        # 待翻译的段落 -> 在segments中的位置，相同的段落只翻译一次
+        pending = OrderedDict()
+        for index, segment in enumerate(segments):
+            if not segment.strip():
+                results[index] = SegmentResult(segment, None, False)
+                continue
+            if cache is not None:
+                cached = cache.get(make_cache_key(segment, from_lang, to_lang))
+                if cached is not None:
+                    results[index] = SegmentResult(cached, None, True)
+                    continue
+            pending.setdefault(segment, []).append(index)
+
+        if not pending:
+            return results
+
+        # 配置了翻译服务时交给服务处理，服务不可用时直接调用翻译接口
+        if config.TRANSLATION_SERVICE_URL:
+            try:
+                response = cls.service_call("/translate_many", {
+                    "segments": list(pending), "from": from_lang, "to": to_lang, "priority": priority})
+                for segment, item in zip(pending, response["results"]):
+                    result = SegmentResult(item["text"], item["error"], item["cached"])
+                    if result.error is None and cache is not None:
+                        cache.put(make_cache_key(segment, from_lang, to_lang), result.text)
+                    for index in pending[segment]:
+                        results[index] = result
+                return results
+            except (requests.exceptions.RequestException, ValueError, KeyError, TypeError):
+                pass
+
+        error = cls._credentials_error()
+        if error:
+            for indexes in pending.values():
+                for index in indexes:
+                    results[index] = SegmentResult(None, error, False)
+            return results
+
+        # 按行拆分，空行不发送，组装时原样保留
+        translated_lines = {}
+        lines = []
+        for segment in pending:
+            segment_lines = segment.split("\n")
+            translated_lines[segment] = segment_lines
+            for line_index, line in enumerate(segment_lines):
+                if line.strip():
+                    lines.append((segment, line_index, line))
+
+        errors = {}
+        for batch in cls._pack(lines, get_router().max_query_bytes()):
+            translated_parts, error = cls._request([line for _, _, line in batch],
+                                                   from_lang, to_lang, priority)
+            if error is None and len(translated_parts) != len(batch):
+                error = "翻译出错: 译文行数与原文不一致"
+            for i, (segment, line_index, _) in enumerate(batch):
+                if error is not None:
+                    errors[segment] = error
+                else:
+                    translated_lines[segment][line_index] = translated_parts[i]
+
+        for segment, indexes in pending.items():
+            if segment in errors:
+                result = SegmentResult(None, errors[segment], False)
+            else:
+                text = "\n".join(translated_lines[segment])
+                if cache is not None:
+                    cache.put(make_cache_key(segment, from_lang, to_lang), text)
+                result = SegmentResult(text, None, False)
+            for index in indexes:
+                results[index] = result
+        return results